@@ -0,0 +1,207 @@
+import os
+import sys
+import argparse
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+from compiler import Compiler
+from lex import Scanner, Token, Fragment
+from syntax_tree import SyntaxNode
+
+
+# Программа в духе test/template_method.py: горячий цикл вызывает методы через наследование
+DISPATCH_PROGRAM = '''
+class Employee:
+    def __init__(self, name: str):
+        self.__name = name
+        self.salary = 0
+
+    def rank(self) -> int:
+        return 1
+
+    def pay(self, amount: int) -> int:
+        self.salary = self.salary + amount * self.rank()
+        return self.salary
+
+class Welder(Employee):
+    def __init__(self, name: str, degree: int):
+        super().__init__(name)
+        self.__degree = degree
+
+    def rank(self) -> int:
+        return self.__degree
+
+class Manager(Employee):
+    def rank(self) -> int:
+        return 10
+
+def work(n: int) -> int:
+    welder = Welder('Charles', 3)
+    manager = Manager('Alice')
+    total = 0
+    for i in range(n):
+        total = total + welder.pay(1) + manager.pay(2)
+    return total
+
+print(work(10))
+'''
+
+NUMPY_IMPORT = 'import numpy as np\n'
+
+JULIA_DRIVER = '''
+first = @elapsed include("{path}")
+entry = () -> {entry}
+entry()
+steady = minimum([@elapsed(entry()) for _ in 1:{rounds}])
+println(first, " ", steady)
+'''
+
+
+def load_corpus(repeat):
+    # импорт numpy разрешен только в начале модуля, поэтому в склеенном корпусе он один
+    sources = []
+    for test_filename in sorted(os.listdir('test')):
+        with open(os.path.join('test', test_filename), 'r') as test_f:
+            source = test_f.read().replace(NUMPY_IMPORT, '')
+            sources.append(source.strip('\n') + '\n')
+    return NUMPY_IMPORT + '\n'.join(sources) * repeat
+
+
+def scan(program, fast):
+    # тот же поток токенов, что получает парсер
+    return sum(1 for _ in Scanner(program + '$', None, fast=fast).tokens())
+
+
+def bench_lex(repeat, rounds):
+    program = load_corpus(repeat)
+    print(f"Лексер: {len(program)} символов, лучший из {rounds} запусков")
+
+    results = {}
+    for fast in (False, True):
+        best = None
+        for _ in range(rounds):
+            start = time.perf_counter()
+            count = scan(program, fast)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[fast] = best
+        name = 'табличный' if fast else 'посимвольный'
+        print(f"  {name:>12}: {count} токенов, {best * 1000:.1f} мс, {count / best:.0f} токенов/с")
+
+    print(f"  ускорение: {results[False] / results[True]:.2f}x\n")
+
+
+def fields(obj):
+    if hasattr(obj, '__dict__'):
+        return list(vars(obj).values())
+    return [getattr(obj, name, None) for cls in type(obj).__mro__ for name in getattr(cls, '__slots__', ())]
+
+
+def footprint(obj):
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def walk(tree):
+    seen = set()
+    stack = [tree]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, (list, tuple, set)):
+            stack.extend(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (SyntaxNode, Token, Fragment)) and id(obj) not in seen:
+            seen.add(id(obj))
+            yield obj
+            stack.extend(fields(obj))
+
+
+def bench_memory(repeat):
+    program = load_corpus(repeat)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    compiler = Compiler(program)
+    tree = compiler.get_parser(compiler.get_scanner().tokens()).parse()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+    counts = Counter()
+    sizes = Counter()
+    for obj in walk(tree):
+        kind = 'узлы' if isinstance(obj, SyntaxNode) else 'токены' if isinstance(obj, Token) else 'фрагменты'
+        counts[kind] += 1
+        sizes[kind] += footprint(obj)
+
+    total = sum(counts.values())
+    print(f"Память дерева разбора: {len(program)} символов, {total} объектов, {allocated / 1024:.0f} КиБ после разбора")
+    for kind in ('узлы', 'токены', 'фрагменты'):
+        if counts[kind]:
+            print(f"  {kind:>9}: {counts[kind]} шт., {sizes[kind] / counts[kind]:.0f} байт на объект")
+    print(f"  в среднем: {allocated / total:.0f} байт на объект с учетом списков и строк\n")
+
+
+def bench_julia(iterations, rounds):
+    julia = shutil.which('julia')
+    if julia is None:
+        print("Julia: julia не найдена в PATH, замер диспетчеризации пропущен\n")
+        return
+
+    print(f"Julia: первый вызов и установившийся режим, work({iterations}), лучший из {rounds} запусков")
+    modes = (
+        ('call(Val)', True, f'call(Val(:work), {iterations})'),
+        ('функции', False, f'work({iterations})'),
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, val_dispatch, entry in modes:
+            path = os.path.join(tmp, 'dispatch.jl')
+            with open(path, 'w') as jl_f:
+                jl_f.write(Compiler(DISPATCH_PROGRAM, val_dispatch=val_dispatch).compile())
+
+            driver = JULIA_DRIVER.format(path=path, entry=entry, rounds=rounds)
+            result = subprocess.run([julia, '--startup-file=no', '-e', driver],
+                                    capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"  {name:>10}: ошибка Julia\n{result.stderr}")
+                continue
+            first, steady = map(float, result.stdout.split()[-2:])
+            print(f"  {name:>10}: загрузка и первый запуск {first * 1000:.0f} мс, цикл {steady * 1000:.2f} мс")
+    print()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Замеры производительности транспайлера на файлах из папки test."
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=50,
+        help='Сколько раз повторить корпус из папки test'
+    )
+    parser.add_argument(
+        '--rounds',
+        type=int,
+        default=5,
+        help='Количество запусков каждого замера'
+    )
+    parser.add_argument(
+        '--iterations',
+        type=int,
+        default=1000000,
+        help='Количество итераций горячего цикла в замере Julia'
+    )
+    args = parser.parse_args()
+
+    bench_lex(args.repeat, args.rounds)
+    bench_memory(args.repeat)
+    bench_julia(args.iterations, args.rounds)
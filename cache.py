@@ -0,0 +1,124 @@
+import hashlib
+import os
+import tempfile
+
+# Модули, от которых зависит результат трансляции: их изменение делает недействительным весь кэш
+COMPILER_MODULES = ('lex.py', 'syntax_tree.py', 'syx.py', 'infer.py', 'callgraph.py', 'generator.py', 'compiler.py')
+
+DEFAULT_CACHE_DIR = '.jlcache'
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_compiler_version = None
+# папка кэша -> общий размер записей, каким его знает этот процесс; полный обход папки нужен
+# только при первой записи и когда предел превышен
+_cache_sizes = {}
+
+
+def compiler_version():
+    # Хэш исходников транслятора, считается один раз на процесс
+    global _compiler_version
+    if _compiler_version is None:
+        digest = hashlib.sha256()
+        base = os.path.dirname(os.path.abspath(__file__))
+        for name in COMPILER_MODULES:
+            with open(os.path.join(base, name), 'rb') as module_f:
+                digest.update(module_f.read())
+        _compiler_version = digest.hexdigest()
+    return _compiler_version
+
+
+def current_umask():
+    # umask можно только заменить, поэтому он сразу возвращается на место
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def write_atomic(path, text):
+    # Пишем во временный файл рядом с результатом и подменяем его одним rename:
+    # параллельные процессы и прерванный запуск не оставляют недописанных файлов
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as tmp_f:
+            tmp_f.write(text)
+        # mkstemp создает файл с правами 0600 - выставляем обычные права с учетом umask
+        os.chmod(tmp_path, 0o666 & ~current_umask())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class CompileCache:
+    # Кэш результатов на диске: файл на каждый исходник, версию транслятора и параметры трансляции.
+    # Время изменения файла - время последнего обращения, по нему вытесняются старые записи,
+    # когда общий размер превышает max_bytes. Записи атомарны, так что кэш можно делить между процессами
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, program: str, val_dispatch=False):
+        # в ключ входят и параметры трансляции: один исходник дает разный код в разных режимах
+        digest = hashlib.sha256(compiler_version().encode())
+        digest.update(repr((val_dispatch,)).encode())
+        digest.update(program.encode())
+        return digest.hexdigest()
+
+    def path(self, program: str, val_dispatch=False):
+        return os.path.join(self.directory, self.key(program, val_dispatch) + '.jl')
+
+    def get(self, program: str, val_dispatch=False):
+        path = self.path(program, val_dispatch)
+        try:
+            with open(path, 'r') as cached_f:
+                result = cached_f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return result
+
+    def put(self, program: str, result: str, val_dispatch=False):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(program, val_dispatch)
+        try:
+            replaced = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced = 0
+        write_atomic(path, result)
+
+        directory = os.path.abspath(self.directory)
+        total = _cache_sizes.get(directory)
+        if total is None:
+            total = self.evict()
+        else:
+            total += os.stat(path).st_size - replaced
+            if total > self.max_bytes:
+                total = self.evict()
+        _cache_sizes[directory] = total
+
+    def evict(self):
+        # Возвращает размер записей, оставшихся после вытеснения
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.jl'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
@@ -0,0 +1,119 @@
+from typing import Dict, Optional, Set, Tuple
+
+from syntax_tree import *
+
+
+class CallGraph:
+    # Достижимость по именам: функция или метод считаются используемыми, если их имя встречается
+    # в достижимом коде. Получатель вызова метода обычно неизвестен, поэтому obj.m() оставляет
+    # методы m во всех достижимых классах, в том числе переопределенные в наследниках
+
+    def __init__(self, compiler):
+        self.compiler = compiler
+        self.functions: Dict[str, FunctionDefNode] = {}
+        self.names: Set[str] = set()
+        # (класс, метод), вызываемые явно: super().m(...) и Class.m(...)
+        self.explicit: Set[Tuple[str, str]] = set()
+
+        self.reachable_functions: Set[FunctionDefNode] = set()
+        self.reachable_classes: Set[str] = set()
+        self.reachable_methods: Set[FunctionDefNode] = set()
+
+    def analyze(self, tree: StatementsNode):
+        roots = []
+        for statement in tree.statements:
+            compound = statement.statement.compound_statement \
+                if isinstance(statement.statement, CompoundStatementNode) else None
+            if isinstance(compound, FunctionDefNode):
+                self.functions[compound.name.attr] = compound
+            elif not isinstance(compound, ClassDefNode):
+                roots.append(statement)
+
+        for statement in roots:
+            self.walk(statement, None)
+        # модуль без исполняемого кода - библиотека: все его определения, включая методы классов,
+        # используются извне
+        library = not roots
+        if library:
+            self.names.update(self.functions)
+            self.names.update(self.compiler.classes)
+
+        changed = True
+        while changed:
+            changed = False
+            for name, function in self.functions.items():
+                if name in self.names and function not in self.reachable_functions:
+                    self.reachable_functions.add(function)
+                    self.walk(function.params, None)
+                    self.walk(function.block, None)
+                    changed = True
+
+            for name, class_node in self.compiler.classes.items():
+                if name not in self.reachable_classes and name in self.names:
+                    # для наследника нужны абстрактные типы и конструкторы всех предков
+                    while class_node is not None and class_node.name.attr not in self.reachable_classes:
+                        self.reachable_classes.add(class_node.name.attr)
+                        self.names.add(class_node.name.attr)
+                        super_name = class_node.super_name
+                        class_node = self.compiler.get_class(super_name.attr) if super_name else None
+                    changed = True
+
+            for name in self.reachable_classes:
+                class_node = self.compiler.get_class(name)
+                for method in self.class_methods(class_node):
+                    if method in self.reachable_methods:
+                        continue
+                    if library or method.name.attr == '__init__' or method.name.attr in self.names:
+                        self.reachable_methods.add(method)
+                        self.walk(method.params, class_node)
+                        self.walk(method.block, class_node)
+                        changed = True
+
+    def class_methods(self, class_node: ClassDefNode):
+        for statement in class_node.block.statements.statements:
+            if isinstance(statement.statement, CompoundStatementNode) \
+                    and isinstance(statement.statement.compound_statement, FunctionDefNode):
+                yield statement.statement.compound_statement
+
+    def walk(self, node, class_node: Optional[ClassDefNode]):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            if isinstance(node, (list, tuple, set)):
+                stack.extend(node)
+            elif isinstance(node, IdentifierToken):
+                self.names.add(node.attr)
+            elif isinstance(node, SyntaxNode):
+                if isinstance(node, SuperStatementNode):
+                    self.super_stmt(node, class_node)
+                elif isinstance(node, PrimaryNode) and isinstance(node.atom, IdentifierToken) \
+                        and node.atom.attr in self.compiler.classes and node.primary_ is not None and node.primary_.subscript:
+                    self.explicit.add((node.atom.attr, node.primary_.subscript.attr))
+                stack.extend(children(node))
+
+    def super_stmt(self, node: SuperStatementNode, class_node: Optional[ClassDefNode]):
+        if node.super_name:
+            super_name = node.super_name.attr
+        elif class_node is not None and class_node.super_name:
+            super_name = class_node.super_name.attr
+        else:
+            return
+        self.names.add(super_name)
+        if node.super_call.subscript:
+            self.explicit.add((super_name, node.super_call.subscript.attr))
+
+    def is_reachable(self, node):
+        # вложенные функции и прочие узлы не отслеживаются и остаются в программе
+        if isinstance(node, FunctionDefNode) and self.functions.get(node.name.attr) is node:
+            return node in self.reachable_functions
+        if isinstance(node, ClassDefNode):
+            return node.name.attr in self.reachable_classes
+        return True
+
+    def is_reachable_method(self, node: FunctionDefNode):
+        return node in self.reachable_methods
+
+    def is_explicit(self, class_name: str, method: str):
+        return (class_name, method) in self.explicit
@@ -1,20 +1,24 @@
 from typing import Dict, List
 
+from callgraph import CallGraph
 from generator import Generator
-from lex import Scanner, EofToken, DedentToken, NewlineToken, CommentToken
+from infer import TypeInference
+from lex import Scanner
 from syx import Parser, ClassDefNode
 
 
 class Compiler:
-    def __init__(self, program):
+    def __init__(self, program, val_dispatch=False):
         self.program = program + '$'
+        self.val_dispatch = val_dispatch
         self.name_codes: Dict[str, int] = {}
         self.names: List[str] = []
         
         self.classes: Dict[str, ClassDefNode] = {}
 
-        self.tokens = []
         self.tree = None
+        self.inference = None
+        self.call_graph = None
         
     def add_class(self, node: ClassDefNode):
         self.classes[node.name.attr] = node
@@ -37,31 +41,36 @@ class Compiler:
     def get_scanner(self):
         return Scanner(self.program, self)
 
-    def get_parser(self):
-        return Parser(self.tokens, self)
+    def get_parser(self, tokens):
+        return Parser(tokens, self)
+
+    def get_type_inference(self):
+        return TypeInference(self)
+
+    def get_call_graph(self):
+        return CallGraph(self)
 
     def get_generator(self):
-        return Generator(self)
+        return Generator(self, self.val_dispatch)
 
-    def compile(self):
+    def parse(self):
         scanner = self.get_scanner()
 
-        token = None
-        nl = True
-        dedent = False
-        while not isinstance(token, EofToken):
-            token = scanner.next_token(nl, dedent)
-            if isinstance(token, CommentToken):
-                continue
-            self.tokens.append(token)
+        parser = self.get_parser(scanner.tokens())
+        return parser.parse()
 
-            nl = isinstance(token, NewlineToken)
-            dedent = isinstance(token, DedentToken)
+    def analyze(self, tree):
+        # Анализ всего модуля: типы и достижимость зависят от всех определений сразу
+        self.tree = tree
 
-            # print(f'{token.tag} {token.attr if token.attr else ""}')
+        self.inference = self.get_type_inference()
+        self.inference.infer(self.tree)
 
-        parser = self.get_parser()
-        self.tree = parser.parse()
+        self.call_graph = self.get_call_graph()
+        self.call_graph.analyze(self.tree)
+
+    def compile(self):
+        self.analyze(self.parse())
 
         generator = self.get_generator()
         return generator.generate(self.tree)
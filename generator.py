@@ -1,23 +1,42 @@
+from collections import Counter
+from typing import Tuple
+
 from syntax_tree import *
+from infer import ARRAY
 
 types_map = {
     'int': 'Int64',
     'float': 'Float64',
     'str': 'String',
+    'bool': 'Bool',
 }
 
 functions_map = {
-    'min': 'min',
-    'max': 'max',
     'minimum': 'min.',
     'maximum': 'max.',
     'log': 'log.',
+    'sin': 'sin.',
+    'cos': 'cos.',
     'print': 'println',
     'round': 'round.',
     'shape': 'size',
     'str': 'string'
 }
 
+# Свертки NumPy: np.f(a) сворачивает весь массив, np.f(a, axis=k) - одно измерение,
+# которое в отличие от Julia пропадает из формы результата
+reductions_map = {
+    'sum': 'sum',
+    'min': 'minimum',
+    'max': 'maximum',
+    'mean': 'mean',
+    'median': 'median',
+    'std': 'std',
+}
+
+# Функции из стандартной библиотеки Statistics
+statistics_functions = ('mean', 'median', 'std')
+
 methods_map = {
     'append': 'push!',
 }
@@ -35,24 +54,209 @@ tensor_op_map = {
     'divide': './',
 }
 
+# Имена, которые нельзя определять как обычные функции Julia: ключевые слова, вспомогательные
+# функции транспайлера и функции Base, которые генератор вызывает или которые легко перекрыть
+julia_reserved = frozenset((
+    'abstract', 'baremodule', 'begin', 'break', 'catch', 'const', 'continue', 'do', 'else', 'elseif',
+    'end', 'export', 'false', 'finally', 'for', 'function', 'global', 'if', 'import', 'let', 'local',
+    'macro', 'module', 'mutable', 'primitive', 'quote', 'return', 'struct', 'true', 'try', 'type',
+    'using', 'where', 'while', 'call', 'getattr', 'setattr!', 'new', 'nothing', 'missing',
+    'abs', 'all', 'any', 'append', 'collect', 'convert', 'copy', 'cos', 'count', 'delete', 'div',
+    'empty', 'error', 'exp', 'fill', 'filter', 'first', 'get', 'insert', 'isempty', 'join', 'keys',
+    'last', 'length', 'log', 'map', 'max', 'mean', 'median', 'merge', 'min', 'mod', 'ones', 'parse',
+    'pop', 'print', 'println', 'push', 'rand', 'range', 'reduce', 'rem', 'repeat', 'replace',
+    'reverse', 'round', 'show', 'sin', 'size', 'sleep', 'sort', 'split', 'sqrt', 'std', 'string',
+    'sum', 'time', 'transpose', 'values', 'zeros',
+    'axes', 'dropdims', 'eachindex', 'getproperty', 'hasproperty', 'haskey', 'invoke', 'maximum',
+    'minimum', 'ndims', 'permutedims', 'throw',
+))
+
+# __init__ в Julia - функция инициализации модуля, поэтому конструкторы получают другое имя
+julia_names = {
+    '__init__': 'init!',
+}
+
 def get_abstract_name(name: str):
     return f'_A{name}'
 
 
+# Буфер вывода: дописывание за O(1), откат к метке без копирования всей программы
+class OutputBuffer:
+    def __init__(self):
+        self.chunks = []
+
+    def __iadd__(self, other):
+        if not isinstance(other, str):
+            raise TypeError(f'Only str can be added to the output, got {type(other).__name__}')
+        self.chunks.append(other)
+        return self
+
+    def __str__(self):
+        return ''.join(self.chunks)
+
+    def mark(self):
+        return len(self.chunks)
+
+    def since(self, mark):
+        return ''.join(self.chunks[mark:])
+
+    def rewind(self, mark):
+        del self.chunks[mark:]
+
+    def insert(self, mark, text):
+        # метки после mark сдвигаются, поэтому вставлять нужно с конца
+        self.chunks.insert(mark, text)
+
+    def tail(self, n):
+        cum = ''
+        i = len(self.chunks) - 1
+        while len(cum) < n and i >= 0:
+            cum = self.chunks[i] + cum
+            i -= 1
+        return cum[-n:]
+
+
 class Generator:
-    program = ''
     indent_count = 0
 
-    def __init__(self, compiler):
+    def __init__(self, compiler, val_dispatch: bool = False):
         self.compiler = compiler
+        # val_dispatch - прежний режим: все функции и методы - методы одной функции call(::Val{:name}, ...)
+        self.val_dispatch = val_dispatch
+        self.value_names: Optional[Set[str]] = None
         self.cur_class = None
+        self.cur_function = None
+        self.declared_classes: Set[str] = set()
+        self.struct_fields_cache: Dict[str, Set[str]] = {}
+        # getattr и setattr! нужны, только если какой-то доступ к полю не удалось разрешить статически,
+        # поэтому их текст откладывается до конца генерации: (метка, getattr, setattr!)
+        self.attr_helpers: List[Tuple[int, str, str]] = []
+        self.uses_getattr = False
+        self.uses_setattr = False
+        # внутри @.(...) операторы и функции пишутся без точек
+        self.fused = False
+        self.inplace_cache: Dict[Optional[FunctionDefNode], Set[str]] = {}
+        self.views_cache: Dict[Optional[FunctionDefNode], Set[int]] = {}
+        self.lists_cache: Dict[Optional[FunctionDefNode], Set[str]] = {}
+        # id узла -> (список, переменная цикла, ...) для циклов append, заменяемых записью по индексу
+        self.presized: Dict[int, Tuple] = {}
+        # id срезов a[i], где i уже индекс Julia (цикл по eachindex) и не сдвигается на единицу
+        self.native_indices: Set[int] = set()
+        self.tree = None
+        self.uses_statistics = False
+        self.program = OutputBuffer()
         
     def _is_private(self, name: str):
         return name.startswith('__') and not name.endswith('__')
 
+    def _struct_fields(self, node: ClassDefNode):
+        # (имя поля в структуре, тип) в том порядке, в котором поля объявляются
+        fields = []
+        for attr in node.attrs:
+            name = f'_{node.name.attr}{attr}' if self._is_private(attr) else attr
+            fields.append((name, node.attr2type.get(attr)))
+        if node.super_name:
+            super_node = self.compiler.get_class(node.super_name.attr)
+            for attr in super_node.attrs:
+                if not self._is_private(attr) and attr in node.attrs:
+                    continue
+                name = f'_{node.super_name.attr}{attr}' if self._is_private(attr) else attr
+                fields.append((name, super_node.attr2type.get(attr)))
+        return fields
+
+    def _is_subclass(self, class_name: str, base_name: str):
+        while class_name is not None:
+            if class_name == base_name:
+                return True
+            super_name = self.compiler.get_class(class_name).super_name
+            class_name = super_name.attr if super_name else None
+        return False
+
+    def _known_field(self, receiver: str, field: str):
+        # Поле можно читать и писать напрямую, если оно есть в структуре класса получателя
+        # и во всех его наследниках
+        if self.compiler.inference is None:
+            return False
+        class_name = self.compiler.inference.var_type(self.cur_function, receiver)
+        if class_name not in self.compiler.classes:
+            return False
+        if class_name not in self.struct_fields_cache:
+            common = None
+            for name, class_node in self.compiler.classes.items():
+                if self._is_subclass(name, class_name):
+                    fields = {field_name for field_name, _ in self._struct_fields(class_node)}
+                    common = fields if common is None else common & fields
+            self.struct_fields_cache[class_name] = common
+        return field in self.struct_fields_cache[class_name]
+
+    def _direct(self, name: str):
+        # Функцию можно назвать своим именем, если оно не совпадает с ключевым словом или функцией Julia,
+        # с именем класса и с именем какой-либо переменной или параметра
+        if self.val_dispatch or not name.isidentifier() or name in julia_reserved or name in self.compiler.classes:
+            return False
+        if self.value_names is None:
+            self.value_names = set()
+            if self.compiler.inference is not None:
+                for env in self.compiler.inference.envs.values():
+                    self.value_names.update(env)
+        return name not in self.value_names
+
+    def _def_head(self, name: str, class_name: str = None, prefix: str = 'function '):
+        # Возвращает True, если в скобках уже есть параметры-диспетчеры
+        if self._direct(name):
+            self.program += f'{prefix}{julia_names.get(name, name)}('
+            head = ['::Type{' + class_name + '}'] if class_name else []
+        else:
+            self.program += f'{prefix}call('
+            head = ['::Val{' + f':{class_name}' + '}'] if class_name else []
+            head.append('::Val{' + f':{name}' + '}')
+        self.program += ', '.join(head)
+        return bool(head)
+
+    def _call_head(self, name: str, class_name: str = None, receiver: str = None):
+        if self._direct(name):
+            self.program += f'{julia_names.get(name, name)}('
+            head = [class_name] if class_name else []
+        else:
+            self.program += 'call('
+            head = [f'Val(:{class_name})'] if class_name else []
+            head.append(f'Val(:{name})')
+        if receiver is not None:
+            head.append(receiver)
+        self.program += ', '.join(head)
+        return bool(head)
+
+    def _invoke(self, name: str, arg_types: List[str], args: List[str]):
+        # invoke вызывает метод с заданной сигнатурой, а не самый специфичный для типов аргументов
+        if self._direct(name):
+            callee = julia_names.get(name, name)
+        else:
+            callee = 'call'
+            arg_types = ['Val{' + f':{name}' + '}'] + arg_types
+            args = [f'Val(:{name})'] + args
+        self.program += f'invoke({callee}, Tuple' + '{' + ', '.join(arg_types) + '}, ' + ', '.join(args) + ')'
+
+    def _reachable(self, node):
+        return self.compiler.call_graph is None or self.compiler.call_graph.is_reachable(node)
+
+    def _reachable_method(self, node: FunctionDefNode):
+        return self.compiler.call_graph is None or self.compiler.call_graph.is_reachable_method(node)
+
+    def _explicit(self, class_name: str, method: str):
+        return self.compiler.call_graph is None or self.compiler.call_graph.is_explicit(class_name, method)
+
     def generate(self, tree):
+        self.tree = tree
         self.statements(tree)
-        return self.program
+        return self.finish()
+
+    def finish(self):
+        # Вспомогательные функции, которые понадобились по ходу генерации
+        for mark, getter, setter in reversed(self.attr_helpers):
+            self.program.insert(mark, (getter if self.uses_getattr else '') + (setter if self.uses_setattr else ''))
+        if self.uses_statistics:
+            self.program.insert(0, 'using Statistics\n\n')
+        return str(self.program)
 
     def w(self):
         self.program += ' '
@@ -68,11 +272,164 @@ class Generator:
         self.indent_count -= 1
 
     def statements(self, node: StatementsNode):
-        for i, statement in enumerate(node.statements):
+        statements = [statement for statement in node.statements
+                      if not isinstance(statement.statement, CompoundStatementNode)
+                      or self._reachable(statement.statement.compound_statement)]
+        for i, statement in enumerate(statements):
+            if i < len(statements) - 1:
+                self._append_loop(statement, statements[i + 1])
             self.statement(statement)
-            if i < len(node.statements) - 1:
+            if i < len(statements) - 1:
                 self.nl()
 
+    def _append_loop(self, first: StatementNode, second: StatementNode):
+        # xs = [] и сразу за ним for i in range(n): ... xs.append(e) ... без break, continue и return:
+        # список заранее выделяется на n элементов, а append заменяется записью xs[i + 1] = e.
+        # Цикл заполняет все элементы, а другой ссылки на новый список внутри цикла нет, поэтому
+        # выделять заранее можно и список, который потом возвращается или передается дальше - только
+        # тип элементов у него остается Any. В модуле список виден функциям, которые вызывает цикл
+        if not isinstance(first.statement, SimpleStatementNode) or not isinstance(second.statement, CompoundStatementNode):
+            return
+        assignment, loop = first.statement.simple_statement, second.statement.compound_statement
+        if not isinstance(assignment, AssignmentNode) or not isinstance(loop, ForStatementNode) \
+                or len(assignment.declarations) != 1 or assignment.op.attr != '=' or loop.else_block:
+            return
+        decl, value = assignment.declarations[0], assignment.expressions.expressions[0]
+        if decl.primary_ or not isinstance(value, ListNode) or value.expressions:
+            return
+        name = decl.name
+
+        iterable = loop.expressions.expressions
+        if len(iterable) != 1 or not isinstance(iterable[0], BuiltinFunctionNode) or iterable[0].name != 'range' \
+                or len(iterable[0].arguments.expressions) != 1:
+            return
+        count = iterable[0].arguments.expressions[0]
+        if not self._is_pure(count) or self._uses_name(count, name):
+            return
+
+        appends = [statement for statement in loop.block.statements.statements if self._is_append(statement, name)]
+        if len(appends) != 1 or self._count_name(loop.block, name) != 1 \
+                or self._jumps(loop.block) or self._assigns(loop.block, loop.name.attr) \
+                or self.cur_function is not None and self._is_param(name) \
+                or self.cur_function is None and name not in self._local_lists():
+            return
+
+        element = None
+        if self.compiler.inference is not None and name in self._local_lists():
+            element = self.compiler.inference.list_element(self.cur_function, name)
+        element = types_map.get(element, 'Any')
+        self.presized[id(assignment)] = (name, element, count)
+        # цикл по range(len(a)) может стать циклом по индексам Julia, и тогда индекс уже с единицы
+        offset = '' if self._index_loop(loop) is not None else ' + 1'
+        self.presized[id(appends[0].statement.simple_statement)] = (name, loop.name.attr, offset)
+
+    def _is_append(self, node: StatementNode, name: str):
+        if not isinstance(node.statement, SimpleStatementNode) or not isinstance(node.statement.simple_statement, ExpressionsNode):
+            return False
+        expressions = node.statement.simple_statement.expressions
+        if len(expressions) != 1 or not isinstance(expressions[0], PrimaryNode):
+            return False
+        primary = expressions[0]
+        link = primary.primary_
+        return isinstance(primary.atom, IdentifierToken) and primary.atom.attr == name \
+            and link is not None and link.subscript is not None and link.subscript.attr == 'append' \
+            and link.primary_ is not None and link.primary_.arguments is not None \
+            and len(link.primary_.arguments.expressions) == 1 and link.primary_.primary_ is None
+
+    def _is_pure(self, node):
+        # Выражение без побочных эффектов, которое можно вычислить повторно
+        if isinstance(node, (IdentifierToken, NumberToken)):
+            return True
+        if isinstance(node, GroupNode):
+            return self._is_pure(node.expression)
+        if isinstance(node, (SumNode, TermNode)):
+            return all(self._is_pure(operand) for operand in node.operands)
+        if isinstance(node, FactorNode):
+            return self._is_pure(node.power)
+        if isinstance(node, BuiltinFunctionNode) and node.name == 'len':
+            return all(self._is_pure(argument) for argument in node.arguments.expressions)
+        return False
+
+    def _is_param(self, name: str):
+        params = self.cur_function.params
+        return params is not None and any(param.name.attr == name for param in params.params)
+
+    def _count_name(self, node, name: str):
+        if isinstance(node, IdentifierToken):
+            return int(node.attr == name)
+        if isinstance(node, (list, tuple)):
+            return sum(self._count_name(child, name) for child in node)
+        if isinstance(node, SyntaxNode):
+            return sum(self._count_name(child, name) for child in children(node))
+        return 0
+
+    def _jumps(self, node):
+        if isinstance(node, SimpleStmtKeywordToken):
+            return node.attr in ('break', 'continue')
+        if isinstance(node, ReturnStatementNode):
+            return True
+        if isinstance(node, (list, tuple)):
+            return any(self._jumps(child) for child in node)
+        if isinstance(node, SyntaxNode):
+            return any(self._jumps(child) for child in children(node))
+        return False
+
+    def _assigns(self, node, name: str):
+        if isinstance(node, AssignmentNode):
+            return any(decl.name == name for decl in node.declarations)
+        if isinstance(node, ForStatementNode) and node.name.attr == name:
+            return True
+        if isinstance(node, (list, tuple)):
+            return any(self._assigns(child, name) for child in node)
+        if isinstance(node, SyntaxNode):
+            return any(self._assigns(child, name) for child in children(node))
+        return False
+
+    def _local_lists(self):
+        # Имена, ссылки по которым не уходят дальше: они встречаются только как получатель
+        # индексирования и методов списка, в print, len, str и как перебираемое в for. Возврат
+        # и передача в любую другую функцию - утечка: там список могут дополнить значением другого типа.
+        # Для модуля учитываются и все функции: они могут обращаться к глобальному списку
+        function = self.cur_function
+        if function in self.lists_cache:
+            return self.lists_cache[function]
+        total, safe = Counter(), Counter()
+        self._count_list_uses(function.block if function is not None else self.tree, total, safe)
+        names = {name for name in total if total[name] == safe[name]}
+        self.lists_cache[function] = names
+        return names
+
+    def _count_list_uses(self, node, total: Counter, safe: Counter):
+        if isinstance(node, IdentifierToken):
+            total[node.attr] += 1
+            return
+        if isinstance(node, (list, tuple)):
+            for child in node:
+                self._count_list_uses(child, total, safe)
+            return
+        if not isinstance(node, SyntaxNode):
+            return
+
+        if isinstance(node, PrimaryNode) and isinstance(node.atom, IdentifierToken) and node.primary_ is not None \
+                and (node.primary_.slices is not None
+                     or node.primary_.subscript is not None and node.primary_.subscript.attr in methods_map):
+            total[node.atom.attr] += 1
+            safe[node.atom.attr] += 1
+            self._count_list_uses(node.primary_, total, safe)
+            return
+
+        arguments = None
+        if isinstance(node, BuiltinFunctionNode) and node.name in ('print', 'len', 'str'):
+            arguments = node.arguments
+        elif isinstance(node, ForStatementNode):
+            arguments = node.expressions
+        if arguments is not None:
+            for expr in arguments.expressions:
+                if isinstance(expr, IdentifierToken):
+                    safe[expr.attr] += 1
+        for child in children(node):
+            self._count_list_uses(child, total, safe)
+
     def statement(self, node: StatementNode):
         if isinstance(node.statement, SimpleStatementNode):
             self.simple_statement(node.statement)
@@ -84,6 +441,11 @@ class Generator:
             self.assignment(node.simple_statement)
         elif isinstance(node.simple_statement, SuperStatementNode):
             self.super_stmt(node.simple_statement)
+        elif isinstance(node.simple_statement, ExpressionsNode) and id(node.simple_statement) in self.presized:
+            name, index, offset = self.presized[id(node.simple_statement)]
+            call = node.simple_statement.expressions[0].primary_.primary_
+            self.program += f'{name}[{index}{offset}] = '
+            self.expression(call.arguments.expressions[0])
         elif isinstance(node.simple_statement, ExpressionsNode):
             self.expressions(node.simple_statement)
         elif isinstance(node.simple_statement, SimpleStmtKeywordToken):
@@ -120,27 +482,197 @@ class Generator:
                 else:
                     subscript_name = subscript.attr
                 prev_node.primary_ = None
-                self.program += f'setattr!('
-                self.declaration(decl, hint=False)
-                self.program += f', :{subscript_name}, '
-                self.expression(expr)
-                self.program += ')'
+                if prev_node is decl and self._known_field(decl.name, subscript_name):
+                    self.program += f'{decl.name}.{subscript_name} {node.op.attr} '
+                    self.assigned_value(decl, expr)
+                else:
+                    self.program += f'setattr!('
+                    self.uses_setattr = True
+                    self.declaration(decl, hint=False)
+                    self.program += f', :{subscript_name}, '
+                    self.assigned_value(decl, expr)
+                    self.program += ')'
                 prev_node.primary_ = cur_node
+            elif self._array_update(decl, node.op.attr, expr):
+                if node.op.attr == '=':
+                    # @. превращает = в .= и сливает правую часть в один проход по уже выделенному массиву
+                    self.program += f'@. {decl.name} = '
+                    self.fused = True
+                    self.expression(expr)
+                    self.fused = False
+                else:
+                    self.program += f'{decl.name} .{node.op.attr} '
+                    self.expression(expr)
+                self.nl()
+            elif id(node) in self.presized:
+                name, element, count = self.presized[id(node)]
+                self.declaration(decl)
+                self.program += f' = Vector{{{element}}}(undef, '
+                if isinstance(count, IntegerToken):
+                    self.expression(count)
+                else:
+                    # range(n) с отрицательным n пуст
+                    self.program += 'max('
+                    self.expression(count)
+                    self.program += ', 0)'
+                self.program += ')'
+                self.nl()
             else:
                 self.declaration(decl)
                 self.program += f' {node.op.attr} '
-                self.expression(expr)
+                self.assigned_value(decl, expr)
                 self.nl()
 
+    def assigned_value(self, decl: DeclarationNode, expr: Expression):
+        # Пустой литерал списка с известным типом элементов: Int64[] вместо Vector{Any}
+        element = None
+        if isinstance(expr, ListNode) and not expr.expressions:
+            element = self._list_element(decl)
+        if element is not None:
+            self.program += f'{element}[]'
+        else:
+            self.expression(expr)
+
+    def _list_element(self, decl: DeclarationNode):
+        # Тип элементов берется из аннотации list[T], а для локального списка, который никуда
+        # не передается, - из вывода типов по литералам и вызовам append
+        if isinstance(decl.annotation, TypeNode) and decl.annotation.type.startswith('list['):
+            return self._julia_type(decl.annotation.type[5:-1])
+        if decl.primary_ or self.compiler.inference is None \
+                or self.cur_function is not None and self._is_param(decl.name) \
+                or decl.name not in self._local_lists():
+            return None
+        return types_map.get(self.compiler.inference.list_element(self.cur_function, decl.name))
+
+    def _array_update(self, decl: DeclarationNode, op: str, expr: Expression):
+        if decl.primary_ or self.compiler.inference is None:
+            return False
+        if self.compiler.inference.var_type(self.cur_function, decl.name) != ARRAY:
+            return False
+        # x += y для массива NumPy и так изменяет его на месте
+        if op != '=':
+            return True
+        if decl.name not in self._inplace_names():
+            return False
+        fusion = self._fusion(expr)
+        return fusion is not None and fusion[0] > 0 and self._uses_name(expr, decl.name)
+
+    def _uses_name(self, node, name: str):
+        if isinstance(node, IdentifierToken):
+            return node.attr == name
+        if isinstance(node, (list, tuple)):
+            return any(self._uses_name(child, name) for child in node)
+        if isinstance(node, SyntaxNode):
+            return any(self._uses_name(child, name) for child in children(node))
+        return False
+
+    def _is_fresh(self, expr: Expression):
+        # выражение, которое всегда создает новый массив
+        if isinstance(expr, NumpyNode) and expr.function.name in ('zeros', 'ones'):
+            return True
+        fusion = self._fusion(expr)
+        return fusion is not None and fusion[0] > 0
+
+    def _inplace_names(self):
+        # Локальные массивы, которые можно обновлять на месте: каждое присваивание создает новый массив
+        # с элементами Float64, а сами они встречаются только в поэлементных выражениях, аргументах
+        # функций NumPy (кроме transpose, которая возвращает представление), print, len и return,
+        # так что больше ни одна ссылка на массив не увидит изменения
+        function = self.cur_function
+        if function in self.inplace_cache:
+            return self.inplace_cache[function]
+
+        names = set()
+        if function is not None:
+            env = self.compiler.inference.envs.get(function, {})
+            params = {param.name.attr for param in function.params.params} if function.params else set()
+            names = {name for name, type_ in env.items() if type_ == ARRAY and name not in params}
+
+            total, safe = Counter(), Counter()
+            self._count_uses(function.block, total, safe, False)
+            names = {name for name in names if total[name] == safe[name]}
+            self._check_assignments(function.block, names)
+
+        self.inplace_cache[function] = names
+        return names
+
+    def _count_uses(self, node, total: Counter, safe: Counter, safe_leaf: bool):
+        if isinstance(node, IdentifierToken):
+            total[node.attr] += 1
+            if safe_leaf:
+                safe[node.attr] += 1
+            return
+        if isinstance(node, (list, tuple)):
+            for child in node:
+                self._count_uses(child, total, safe, safe_leaf)
+            return
+        if not isinstance(node, SyntaxNode):
+            return
+
+        if not safe_leaf and isinstance(node, (ComparisonNode, SumNode, TermNode, FactorNode, PowerNode, NumpyNode)):
+            fusion = self._fusion(node)
+            safe_leaf = fusion is not None and fusion[0] > 0
+
+        arguments = None
+        if isinstance(node, NumpyNode) and node.function.name != 'transpose':
+            arguments = node.function.arguments
+        elif isinstance(node, BuiltinFunctionNode) and node.name in ('print', 'len', 'str'):
+            arguments = node.arguments
+        elif isinstance(node, ReturnStatementNode):
+            arguments = node.expressions
+        if not safe_leaf and arguments is not None:
+            for expr in arguments.expressions:
+                self._count_uses(expr, total, safe, isinstance(expr, IdentifierToken))
+            return
+
+        for child in children(node):
+            self._count_uses(child, total, safe, safe_leaf)
+
+    def _check_assignments(self, node, names: Set[str]):
+        if isinstance(node, (list, tuple)):
+            for child in node:
+                self._check_assignments(child, names)
+        elif isinstance(node, AssignmentNode):
+            for decl, expr in zip(node.declarations, node.expressions.expressions):
+                if not decl.primary_ and decl.name in names and node.op.attr == '=' \
+                        and not (self._is_fresh(expr) and self._keeps_float(decl.name, expr)):
+                    names.discard(decl.name)
+        elif isinstance(node, ForStatementNode):
+            names.discard(node.name.attr)
+            for child in children(node):
+                self._check_assignments(child, names)
+        elif isinstance(node, SyntaxNode):
+            for child in children(node):
+                self._check_assignments(child, names)
+
+    def _keeps_float(self, name: str, expr: Expression):
+        # @. x = ... пишет в уже выделенный массив, поэтому тип элементов не должен меняться:
+        # массив создается zeros/ones с Float64, а обновления не дают Bool сравнениями
+        if isinstance(expr, NumpyNode) and expr.function.name in ('zeros', 'ones'):
+            dtype = [keyword.expression for keyword in expr.function.arguments.keywords if keyword.name.attr == 'dtype']
+            return not dtype or (dtype[0].type if isinstance(dtype[0], TypeNode) else dtype[0].attr) == 'float'
+        return self._uses_name(expr, name) and not self._compares(expr)
+
+    def _compares(self, node):
+        if isinstance(node, ComparisonNode):
+            return True
+        if isinstance(node, NumpyNode) and node.function.name in ('equal', 'less', 'greater', 'less_equal', 'greater_equal'):
+            return True
+        if isinstance(node, (list, tuple)):
+            return any(self._compares(child) for child in node)
+        if isinstance(node, SyntaxNode):
+            return any(self._compares(child) for child in children(node))
+        return False
+
     def declaration(self, node: DeclarationNode, hint: bool = True):
-        primary_start_idx = len(self.program)
+        primary_start = self.program.mark()
         self.program += node.name
 
         if self.cur_class and node.name == 'self' and node.primary_\
         and node.primary_.subscript and self._is_private(node.primary_.subscript.attr):
                 node.primary_.subscript.attr = f'_{self.cur_class.name.attr}' + node.primary_.subscript.attr
         if node.primary_:
-            self.primary_(node.primary_, primary_start_idx)
+            self.primary_(node.primary_, primary_start)
         elif hint and node.annotation and isinstance(node.annotation, TypeNode):
             self.program += '::'
             self.type(node.annotation)
@@ -168,12 +700,14 @@ class Generator:
             self.nl()
 
     def function_def(self, node: FunctionDefNode):
+        outer_function = self.cur_function
+        self.cur_function = node
         self.nl()
-        self.program += 'function call('
-        self.program += f'::Val' + '{' + f':{node.name.attr}' + '}'
+        has_head = self._def_head(node.name.attr)
             
         if node.params and len(node.params.params):
-            self.program += ', '
+            if has_head:
+                self.program += ', '
             for i, param in enumerate(node.params.params):
                 self.param(param)
                 if i < len(node.params.params) - 1:
@@ -185,6 +719,7 @@ class Generator:
 
         self.block(node.block)
         self.nl()
+        self.cur_function = outer_function
         
     def super_stmt(self, node: SuperStatementNode):
         class_node = self.cur_class
@@ -201,7 +736,7 @@ class Generator:
             if self._is_private(node.super_call.subscript.attr):
                 node.super_call.subscript.attr = f'_{super_name}' + node.super_call.subscript.attr
             
-            self.program += f'call(Val(:{super_name}), Val(:{node.super_call.subscript.attr}), self'
+            self._call_head(node.super_call.subscript.attr, super_name, 'self')
             
             if node.super_call.primary_.arguments.expressions:
                 self.program += ', '
@@ -216,12 +751,13 @@ class Generator:
     
     def method(self, node: FunctionDefNode, class_node: ClassDefNode):
         method_name = f'_{class_node.name.attr}{node.name.attr}' if self._is_private(node.name.attr) else node.name.attr
+        self.cur_function = node
         
         if node.params.params[0].name.attr == 'self':
             self.nl()
-            self.program += 'function call('
-            
-            self.program += f'::Val' + '{' + f':{method_name}' + '}' + f', self::{get_abstract_name(class_node.name.attr)}'
+            if self._def_head(method_name):
+                self.program += ', '
+            self.program += f'self::{get_abstract_name(class_node.name.attr)}'
 
             if node.params and len(node.params.params) > 1:
                 self.program += ', '
@@ -237,10 +773,29 @@ class Generator:
             self.block(node.block, constructor=(node.name.attr == '__init__'))
             self.nl()
             
+        if node.params.params[0].name.attr == 'self':
+            if not self._explicit(class_node.name.attr, node.name.attr):
+                self.cur_function = None
+                return
+            self.nl()
+            # Вариант с явным классом (super() и Class.method(self, ...)) не дублирует тело,
+            # а вызывает метод именно этого класса, минуя переопределения в наследниках
+            self._def_head(method_name, class_node.name.attr, prefix='')
+            names = [param.name.attr for param in node.params.params]
+            self.program += ', ' + ', '.join(names) + ') = '
+            arg_types = [get_abstract_name(class_node.name.attr)]
+            for param in node.params.params[1:]:
+                if param.annotation and isinstance(param.annotation, TypeNode):
+                    arg_types.append(self._param_type(param.annotation.type))
+                else:
+                    arg_types.append('Any')
+            self._invoke(method_name, arg_types, names)
+            self.nl()
+            self.cur_function = None
+            return
+
         self.nl()
-        self.program += 'function call('
-        
-        self.program += f'::Val' + '{' + f':{class_node.name.attr}' + '}, ' + f'::Val' + '{' + f':{method_name}' + '}'
+        self._def_head(method_name, class_node.name.attr)
             
         if node.params and len(node.params.params):
             self.program += ', '
@@ -255,6 +810,7 @@ class Generator:
         
         self.block(node.block, constructor=(node.name.attr == '__init__'))
         self.nl()
+        self.cur_function = None
         
         
     def constructor(self, node: ClassDefNode):
@@ -263,14 +819,16 @@ class Generator:
         self.nl()
         self.program += 'x = new()'
         self.nl()
-        self.program += 'x.__dynamic_attrs = Dict()'
-        self.nl()
+        if node.has_dynamic_attrs:
+            # словарь создается при первой записи динамического поля
+            self.program += 'x.__dynamic_attrs = nothing'
+            self.nl()
         self.program += 'return x'
         self.dedent()
         self.nl()
         self.program += 'end'
         
-    def getter(self, abstract_name):
+    def getter(self, node: ClassDefNode, abstract_name):
         self.program += f'function getattr(self::{abstract_name}, attr::Symbol)'
         self.indent()
         self.nl()
@@ -280,12 +838,13 @@ class Generator:
         self.program += 'return getproperty(self, attr)'
         self.dedent()
         self.nl()
-        self.program += 'elseif haskey(self.__dynamic_attrs, attr)'
-        self.indent()
-        self.nl()
-        self.program += 'return self.__dynamic_attrs[attr]'
-        self.dedent()
-        self.nl()
+        if node.has_dynamic_attrs:
+            self.program += 'elseif self.__dynamic_attrs !== nothing && haskey(self.__dynamic_attrs, attr)'
+            self.indent()
+            self.nl()
+            self.program += 'return self.__dynamic_attrs[attr]'
+            self.dedent()
+            self.nl()
         self.program += 'else'
         self.indent()
         self.nl()
@@ -297,7 +856,7 @@ class Generator:
         self.nl()
         self.program += 'end'
         
-    def setter(self, abstract_name):
+    def setter(self, node: ClassDefNode, abstract_name):
         self.program += f'function setattr!(self::{abstract_name}, attr::Symbol, val)'
         self.indent()
         self.nl()
@@ -310,7 +869,18 @@ class Generator:
         self.program += 'else'
         self.indent()
         self.nl()
-        self.program += 'self.__dynamic_attrs[attr] = val'
+        if node.has_dynamic_attrs:
+            self.program += 'if self.__dynamic_attrs === nothing'
+            self.indent()
+            self.nl()
+            self.program += 'self.__dynamic_attrs = Dict{Symbol,Any}()'
+            self.dedent()
+            self.nl()
+            self.program += 'end'
+            self.nl()
+            self.program += 'self.__dynamic_attrs[attr] = val'
+        else:
+            self.program += 'throw("Error: No such attribute")'
         self.dedent()
         self.nl()
         self.program += 'end'
@@ -319,6 +889,24 @@ class Generator:
         self.program += 'end'
                 
         
+    def field_type(self, type_: str):
+        # Any и неизвестные типы оставляем без аннотации
+        julia_type = self._julia_type(type_)
+        return f'::{julia_type}' if julia_type is not None else ''
+
+    def _julia_type(self, type_: str):
+        if type_ in types_map:
+            return types_map[type_]
+        if type_ == 'list':
+            return 'Vector{Any}'
+        if type_ and type_.startswith('list['):
+            element = self._julia_type(type_[5:-1])
+            return 'Vector{' + element + '}' if element else None
+        # абстрактный тип класса можно использовать только после его объявления
+        if type_ in self.declared_classes:
+            return get_abstract_name(type_)
+        return None
+
     def class_def(self, node: ClassDefNode):
         self.cur_class = node
         
@@ -329,34 +917,23 @@ class Generator:
             super_abstract_name = f'_A{node.super_name.attr}'
             self.program += f' <: {super_abstract_name}'
         self.program += ' end'
+        self.declared_classes.add(node.name.attr)
         self.nl()
         
         self.program += f'mutable struct {node.name.attr} <: {abstract_name}'
         
         self.indent()
         self.nl()
-        self.program += '__dynamic_attrs::Dict'
-        for attr in node.attrs:
-            self.nl()
-            if self._is_private(attr):
-                self.program += f'_{node.name.attr}{attr}'
-            else:
-                self.program += attr
-            if attr in node.attr2type:
-                self.program += f'::{types_map[node.attr2type[attr]]}'
-                
-        if node.super_name:
-            super_node = self.compiler.get_class(node.super_name.attr)
-            for attr in super_node.attrs:
-                if not self._is_private(attr) and attr in node.attrs:
-                    continue
+        fields = []
+        if node.has_dynamic_attrs:
+            fields.append('__dynamic_attrs::Union{Nothing,Dict{Symbol,Any}}')
+        for name, type_ in self._struct_fields(node):
+            fields.append(name + self.field_type(type_))
+
+        for i, field in enumerate(fields):
+            if i > 0:
                 self.nl()
-                if self._is_private(attr):
-                    self.program += f'_{node.super_name.attr}{attr}'
-                else:
-                    self.program += attr
-                if attr in super_node.attr2type:
-                    self.program += f'::{types_map[super_node.attr2type[attr]]}'
+            self.program += field
         
         self.nl()
         self.nl()
@@ -370,16 +947,20 @@ class Generator:
         
         if not node.has_init:
             self.nl()
-            self.program += f'function call(::Val' + '{' + f':{node.name.attr}' + '}, ::Val{:__init__}, self)'
-            self.indent()
-            self.nl()
-            self.program += f'return self'
-            self.dedent()
-            self.nl()
-            self.program += 'end'
-            self.nl()
-            self.nl()
-            self.program += 'function call(::Val{:__init__}, ' + f'self::{abstract_name})'
+            if self._explicit(node.name.attr, '__init__'):
+                self._def_head('__init__', node.name.attr)
+                self.program += ', self)'
+                self.indent()
+                self.nl()
+                self.program += f'return self'
+                self.dedent()
+                self.nl()
+                self.program += 'end'
+                self.nl()
+                self.nl()
+            if self._def_head('__init__'):
+                self.program += ', '
+            self.program += f'self::{abstract_name})'
             self.indent()
             self.nl()
             self.program += f'return self'
@@ -388,19 +969,26 @@ class Generator:
             self.program += 'end'
             self.nl()
             
+        helpers_start = self.program.mark()
         self.nl()
-        self.getter(abstract_name)
+        self.getter(node, abstract_name)
         self.nl()
+        getter = self.program.since(helpers_start)
+        self.program.rewind(helpers_start)
         self.nl()
-        self.setter(abstract_name)
+        self.setter(node, abstract_name)
         self.nl()
+        setter = self.program.since(helpers_start)
+        self.program.rewind(helpers_start)
+        self.attr_helpers.append((helpers_start, getter, setter))
             
         
         for statement in node.block.statements.statements:
             if isinstance(statement.statement, CompoundStatementNode) and isinstance(statement.statement.compound_statement, FunctionDefNode):
                 func_def_node = statement.statement.compound_statement
                 
-                self.method(func_def_node, node)
+                if self._reachable_method(func_def_node):
+                    self.method(func_def_node, node)
                 
         self.cur_class = None
 
@@ -416,8 +1004,13 @@ class Generator:
     def param(self, node: ParamNode):
         self.program += node.name.attr
         if node.annotation and isinstance(node.annotation, TypeNode):
-            self.program += '::'
-            self.type(node.annotation)
+            self.program += '::' + self._param_type(node.annotation.type)
+
+    def _param_type(self, type_: str):
+        # параметр-список принимает и Vector{Any} от нетипизированного литерала, и представления
+        if type_ == 'list' or type_.startswith('list['):
+            return 'AbstractVector'
+        return types_map[type_]
 
     def if_stmt(self, node: IfStatementNode):
         self.program += 'if'
@@ -456,6 +1049,18 @@ class Generator:
         self.block(node.block)
 
     def for_stmt(self, node: ForStatementNode):
+        index_loop = self._index_loop(node)
+        if index_loop is not None:
+            # for i in range(len(a)), где i только индексирует a: перебираются сами индексы Julia
+            array, slices, inbounds = index_loop
+            self.native_indices.update(id(slice_node) for slice_node in slices)
+            if inbounds:
+                self.program += '@inbounds '
+            self.program += f'for {node.name.attr} in eachindex({array})'
+            self.w()
+            self.block(node.block)
+            return
+
         self.program += 'for'
         self.w()
         self.program += node.name.attr
@@ -466,110 +1071,332 @@ class Generator:
         self.w()
         self.block(node.block)
 
+    def _index_loop(self, node: ForStatementNode):
+        # (массив, срезы a[i], можно ли отключить проверку границ) или None
+        iterable = node.expressions.expressions
+        if len(iterable) != 1 or not isinstance(iterable[0], BuiltinFunctionNode) or iterable[0].name != 'range' \
+                or len(iterable[0].arguments.expressions) != 1:
+            return None
+        length = iterable[0].arguments.expressions[0]
+        if not isinstance(length, BuiltinFunctionNode) or length.name != 'len' \
+                or len(length.arguments.expressions) != 1 or not isinstance(length.arguments.expressions[0], IdentifierToken):
+            return None
+        index, array = node.name.attr, length.arguments.expressions[0].attr
+        array_type = self.compiler.inference.var_type(self.cur_function, array) \
+            if self.compiler.inference is not None else None
+        # только список: у массива NumPy размерность неизвестна, и a[i] многомерного массива -
+        # это строка, а не элемент с линейным индексом Julia
+        if index == array or not (array_type or '').startswith('list'):
+            return None
+
+        slices = []
+        if not self._index_uses(node.block, index, array, slices):
+            return None
+        # @inbounds распространяется на все индексирование в теле и на встроенные вызовы,
+        # поэтому ставится, только если в теле нет других обращений по индексу и вызовов
+        inbounds = self._only_slices(node.block, slices)
+        return array, slices, inbounds
+
+    def _index_uses(self, node, index: str, array: str, slices: List[SliceNode]):
+        # Индекс встречается только как a[i], а сам массив не переприсваивается и не изменяется методами
+        if isinstance(node, IdentifierToken):
+            return node.attr not in (index, array)
+        if isinstance(node, (list, tuple)):
+            return all(self._index_uses(child, index, array, slices) for child in node)
+        if not isinstance(node, SyntaxNode):
+            return True
+
+        if isinstance(node, PrimaryNode) and isinstance(node.atom, IdentifierToken) and node.atom.attr == array:
+            return self._index_link(node.primary_, index, array, slices)
+        if isinstance(node, DeclarationNode):
+            if node.name == index or node.name == array and node.primary_ is None:
+                return False
+            if node.name == array:
+                return self._index_link(node.primary_, index, array, slices) \
+                    and self._index_uses(node.annotation, index, array, slices)
+        if isinstance(node, ForStatementNode) and node.name.attr in (index, array):
+            return False
+        if isinstance(node, BuiltinFunctionNode) and node.name in ('print', 'len', 'str'):
+            return all(isinstance(expr, IdentifierToken) and expr.attr == array
+                       or self._index_uses(expr, index, array, slices) for expr in node.arguments.expressions)
+        return all(self._index_uses(child, index, array, slices) for child in children(node))
+
+    def _index_link(self, link: PrimaryNode_, index: str, array: str, slices: List[SliceNode]):
+        if link is None or link.slices is None:
+            return False
+        for slice_node in link.slices.slices:
+            if len(link.slices.slices) == 1 and not slice_node.is_range \
+                    and isinstance(slice_node.from_expression, IdentifierToken) and slice_node.from_expression.attr == index:
+                slices.append(slice_node)
+            elif not self._index_uses(list(children(slice_node)), index, array, slices):
+                return False
+        return self._index_uses(link.primary_, index, array, slices)
+
+    def _only_slices(self, node, slices: List[SliceNode]):
+        if isinstance(node, (list, tuple)):
+            return all(self._only_slices(child, slices) for child in node)
+        if not isinstance(node, SyntaxNode):
+            return True
+        if isinstance(node, SliceNode) and not any(node is slice_node for slice_node in slices):
+            return False
+        if isinstance(node, PrimaryNode_) and node.arguments is not None \
+                or isinstance(node, (BuiltinFunctionNode, NumpyNode)):
+            return False
+        return all(self._only_slices(child, slices) for child in children(node))
+
     def expressions(self, node: ExpressionsNode):
         for i, expression in enumerate(node.expressions):
             self.expression(expression)
             if i < len(node.expressions) - 1:
                 self.program += ', '
 
-    def expression(self, node: ExpressionNode):
-        self.disjunction(node.disjunction)
+    def _fusion(self, node: Expression):
+        # (число поэлементных операций, есть ли операнд-массив) или None, если дерево нельзя слить
+        if isinstance(node, IdentifierToken):
+            type_ = None
+            if self.compiler.inference is not None:
+                type_ = self.compiler.inference.var_type(self.cur_function, node.attr)
+            if type_ in ('str', 'None') or type_ in self.compiler.classes:
+                return None
+            return 0, type_ not in ('int', 'float', 'bool')
+        if isinstance(node, NumberToken):
+            return 0, False
+        if isinstance(node, GroupNode):
+            return self._fusion(node.expression)
+        if self._is_slice_read(node):
+            return 0, True
+
+        if isinstance(node, (ComparisonNode, SumNode, TermNode)):
+            operands, ops = node.operands, len(node.ops)
+        elif isinstance(node, FactorNode):
+            operands, ops = [node.power], 1
+        elif isinstance(node, PowerNode):
+            operands, ops = [node.primary, node.factor], 1
+        elif isinstance(node, NumpyNode) and node.function.name in NUMPY_ELEMENTWISE_FUNCTIONS:
+            operands, ops = node.function.arguments.expressions, 1
+        else:
+            return None
+
+        arrays = False
+        for operand in operands:
+            fusion = self._fusion(operand)
+            if fusion is None:
+                return None
+            ops += fusion[0]
+            arrays = arrays or fusion[1]
+        return ops, arrays
+
+    def expression(self, node: Expression):
+        if not self.fused and isinstance(node, (ComparisonNode, SumNode, TermNode, FactorNode, PowerNode, NumpyNode)):
+            fusion = self._fusion(node)
+            # одна операция и так выполняется одним проходом, а скаляры сливать незачем
+            if fusion is not None and fusion[0] > 1 and fusion[1]:
+                self.program += '@.('
+                self.fused = True
+                self.expression(node)
+                self.fused = False
+                self.program += ')'
+                return
+
+        if isinstance(node, DisjunctionNode):
+            self.disjunction(node)
+        elif isinstance(node, ConjunctionNode):
+            self.conjunction(node)
+        elif isinstance(node, InversionNode):
+            self.inversion(node)
+        elif isinstance(node, BinaryChainNode):
+            self.binary_chain(node)
+        elif isinstance(node, FactorNode):
+            self.factor(node)
+        elif isinstance(node, PowerNode):
+            self.power(node)
+        elif isinstance(node, PrimaryNode):
+            self.primary(node)
+        else:
+            self.atom(node)
 
     def disjunction(self, node: DisjunctionNode):
-        for i, conjunction in enumerate(node.conjuctions):
-            self.conjunction(conjunction)
-            if i < len(node.conjuctions) - 1:
+        for i, conjunction in enumerate(node.operands):
+            self.expression(conjunction)
+            if i < len(node.operands) - 1:
                 self.program += ' || '
 
     def conjunction(self, node: ConjunctionNode):
-        for i, inversion in enumerate(node.inverstions):
-            self.inversion(inversion)
-            if i < len(node.inverstions) - 1:
+        for i, inversion in enumerate(node.operands):
+            self.expression(inversion)
+            if i < len(node.operands) - 1:
                 self.program += ' && '
 
     def inversion(self, node: InversionNode):
-        if node.inv:
-            self.program += '!'
-        self.comparison(node.comparison)
+        self.program += '!'
+        if isinstance(node.comparison, BinaryChainNode):
+            self.program += '('
+            self.expression(node.comparison)
+            self.program += ')'
+        else:
+            self.expression(node.comparison)
 
-    def comparison(self, node: ComparisonNode):
-        self.sum(node.sum)
+    def binary_chain(self, node: BinaryChainNode):
+        self.expression(node.operands[0])
 
-        if node.comparison_:
-            self.comparison_(node.comparison_)
+        for op, item in zip(node.ops, node.operands[1:]):
+            self.w()
+            if isinstance(op, SumOperatorToken) and self.program.tail(2)[:1] == '"':
+                self.program += '*'
+            elif self.fused:
+                self.program += op.attr
+            else:
+                self.program += '.' + op.attr
+            self.w()
+            self.expression(item)
 
-    def comparison_(self, node: ComparisonNode_):
-        self.w()
-        self.program += '.' + node.op.attr
-        self.w()
-        self.sum(node.sum)
+    def factor(self, node: FactorNode):
+        self.program += node.op.attr
+        self.expression(node.power)
 
-        if node.comparison_:
-            self.comparison_(node.comparison_)
+    def power(self, node: PowerNode):
+        self.expression(node.primary)
+        self.program += '^'
+        self.expression(node.factor)
 
-    def sum(self, node: SumNode):
-        self.term(node.term)
+    def primary(self, node: PrimaryNode):
+        if self.cur_class and isinstance(node.atom, IdentifierToken) and node.atom.attr == 'self'\
+            and node.primary_.subscript and self._is_private(node.primary_.subscript.attr):
+                node.primary_.subscript.attr = f'_{self.cur_class.name.attr}' + node.primary_.subscript.attr
+        if self._is_slice_read(node) and id(node) in self._view_slices():
+            self.program += '@view('
+            primary_start = self.program.mark()
+            self.atom(node.atom)
+            self.primary_(node.primary_, primary_start)
+            self.program += ')'
+            return
+        primary_start = self.program.mark()
+        self.atom(node.atom)
+        self.primary_(node.primary_, primary_start)
 
-        if node.sum_:
-            self.sum_(node.sum_)
+    def _is_slice_read(self, node):
+        return isinstance(node, PrimaryNode) and isinstance(node.atom, IdentifierToken) \
+            and node.primary_.slices is not None and node.primary_.primary_ is None \
+            and any(slice_node.is_range for slice_node in node.primary_.slices.slices)
 
-    def sum_(self, node: SumNode_):
-        self.w()
-        if self.program[-2] == '"':
-            self.program += '*'
-        else:
-            self.program += '.' + node.op.attr
-        self.w()
-        self.term(node.term)
+    def _view_slices(self):
+        # Срезы, которые можно отдать представлением без копирования: срез массива NumPy (в NumPy
+        # это и так представление) и срез, который сразу потребляется - передается в print, len,
+        # функцию NumPy, участвует в арифметике или перебирается в for. Срез, сохраненный в локальную
+        # переменную, тоже становится представлением, если переменная присваивается один раз
+        # и только потребляется, а исходный список в функции не изменяется
+        function = self.cur_function
+        if function in self.views_cache:
+            return self.views_cache[function]
 
-        if node.sum_:
-            self.sum_(node.sum_)
+        views: Set[int] = set()
+        total, consumed = Counter(), Counter()
+        assigned, mutated = Counter(), set()
+        candidates = []
+        self._find_views(function.block if function is not None else self.tree, False,
+                         views, total, consumed, assigned, mutated, candidates)
+        for name, node in candidates:
+            base = node.atom.attr
+            if assigned[name] == 1 and total[name] == consumed[name] \
+                    and name not in mutated and base not in mutated and total[base] == consumed[base]:
+                views.add(id(node))
 
-    def term(self, node: TermNode):
-        self.factor(node.factor)
+        self.views_cache[function] = views
+        return views
 
-        if node.term_:
-            self.term_(node.term_)
+    def _find_views(self, node, consume: bool, views, total, consumed, assigned, mutated, candidates):
+        find = lambda child, flag: self._find_views(child, flag, views, total, consumed, assigned, mutated, candidates)
 
-    def term_(self, node: TermNode_):
-        self.w()
-        self.program += '.' + node.op.attr
-        self.w()
-        self.factor(node.factor)
+        if isinstance(node, IdentifierToken):
+            total[node.attr] += 1
+            if consume:
+                consumed[node.attr] += 1
+            return
+        if isinstance(node, (list, tuple)):
+            for child in node:
+                find(child, consume)
+            return
+        if not isinstance(node, SyntaxNode):
+            return
 
-        if node.term_:
-            self.term_(node.term_)
+        if self._is_slice_read(node):
+            base_type = self.compiler.inference.var_type(self.cur_function, node.atom.attr) \
+                if self.compiler.inference is not None else None
+            if base_type == ARRAY or consume and base_type != 'str':
+                views.add(id(node))
+            # чтение среза не изменяет исходный список
+            total[node.atom.attr] += 1
+            consumed[node.atom.attr] += 1
+            for slice_node in node.primary_.slices.slices:
+                find(list(children(slice_node)), False)
+            return
 
-    def factor(self, node: FactorNode):
-        if node.op:
-            self.program += node.op.attr
-        self.power(node.power)
+        if isinstance(node, AssignmentNode):
+            for decl, expr in zip(node.declarations, node.expressions.expressions):
+                if decl.primary_ or node.op.attr != '=':
+                    mutated.add(decl.name)
+                else:
+                    assigned[decl.name] += 1
+                    if self._is_slice_read(expr):
+                        candidates.append((decl.name, expr))
+                find(decl.primary_, False)
+                find(expr, False)
+            return
 
-    def power(self, node: PowerNode):
-        self.primary(node.primary)
-        if node.factor:
-            self.program += '^'
-            self.factor(node.factor)
+        if isinstance(node, (ExpressionsNode, ArgumentsNode, GroupNode)):
+            for child in children(node):
+                find(child, consume)
+        elif isinstance(node, NumpyNode) and node.function.name != 'transpose':
+            find(node.function.arguments, True)
+        elif isinstance(node, BuiltinFunctionNode) and node.name in ('print', 'len', 'str'):
+            find(node.arguments, True)
+        elif isinstance(node, ForStatementNode):
+            # срез перебирается без копии, только если тело цикла не меняет исходный список
+            body = [node.block, node.else_block]
+            for expr in node.expressions.expressions:
+                find(expr, not self._is_slice_read(expr) or not self._changes(body, expr.atom.attr))
+            find([node.name, node.block, node.else_block], False)
+        elif isinstance(node, (ComparisonNode, SumNode, TermNode)):
+            find(node.operands, True)
+        elif isinstance(node, FactorNode):
+            find(node.power, True)
+        elif isinstance(node, PowerNode):
+            find([node.primary, node.factor], True)
+        else:
+            for child in children(node):
+                find(child, False)
 
-    def primary(self, node: PrimaryNode):
-        if self.cur_class and isinstance(node.atom.atom, IdentifierToken) and node.atom.atom.attr == 'self'\
-            and node.primary_ and node.primary_.subscript and self._is_private(node.primary_.subscript.attr):
-                node.primary_.subscript.attr = f'_{self.cur_class.name.attr}' + node.primary_.subscript.attr
-        primary_start_idx=len(self.program)
-        self.atom(node.atom)
-        if node.primary_:
-            self.primary_(node.primary_, primary_start_idx)
+    def _changes(self, node, name: str):
+        # Может ли код изменить список name: присваивание ему или его элементу, вызов его метода
+        # или передача в любую функцию, кроме print, len и str
+        if isinstance(node, AssignmentNode) and any(decl.name == name for decl in node.declarations):
+            return True
+        if isinstance(node, PrimaryNode) and isinstance(node.atom, IdentifierToken) and node.atom.attr == name:
+            link = node.primary_
+            while link is not None:
+                if link.arguments is not None:
+                    return True
+                link = link.primary_
+        if isinstance(node, BuiltinFunctionNode) and node.name in ('print', 'len', 'str'):
+            return any(self._changes(argument, name) for argument in node.arguments.expressions)
+        if isinstance(node, ArgumentsNode) and self._count_name(node, name):
+            return True
+        if isinstance(node, (list, tuple)):
+            return any(self._changes(child, name) for child in node)
+        if isinstance(node, SyntaxNode):
+            return any(self._changes(child, name) for child in children(node))
+        return False
 
-    def primary_(self, node: PrimaryNode_, primary_start_idx):
-        fragment = self.program[primary_start_idx:]
+    def primary_(self, node: PrimaryNode_, primary_start):
+        fragment = self.program.since(primary_start)
         
         # Вызов статического метода
         if node.subscript and fragment in self.compiler.classes\
         and node.primary_ and node.primary_.arguments:
             if self._is_private(node.subscript.attr):
                 node.subscript.attr = f'_{fragment}' + node.subscript.attr
-            self.program = self.program[:primary_start_idx]
-            self.program += f'call(Val(:{fragment}), Val(:{node.subscript.attr})'
+            self.program.rewind(primary_start)
+            self._call_head(node.subscript.attr, fragment)
             if node.primary_.arguments.expressions:
                 self.program += ', '
                 for i, expr in enumerate(node.primary_.arguments.expressions):
@@ -585,8 +1412,8 @@ class Generator:
         and node.subscript.attr not in methods_map:
             if self._is_private(node.subscript.attr):
                 node.subscript.attr = f'_{fragment}' + node.subscript.attr
-            self.program = self.program[:primary_start_idx]
-            self.program += f'call(Val(:{node.subscript.attr}), {fragment}'
+            self.program.rewind(primary_start)
+            self._call_head(node.subscript.attr, receiver=fragment)
             if node.primary_.arguments.expressions:
                 self.program += ', '
                 for i, expr in enumerate(node.primary_.arguments.expressions):
@@ -599,8 +1426,8 @@ class Generator:
             # Вызов конструктора
             if fragment in self.compiler.classes:
                 constructor_name = f'__init__'
-                self.program = self.program[:primary_start_idx]
-                self.program += f'call(Val(:{constructor_name}), {fragment}()'
+                self.program.rewind(primary_start)
+                self._call_head(constructor_name, receiver=f'{fragment}()')
                 if node.arguments.expressions:
                     self.program += ', '
                     for i, expr in enumerate(node.arguments.expressions):
@@ -610,10 +1437,11 @@ class Generator:
                 self.program += ')'
             # Вызов функции
             else:
-                self.program = self.program[:primary_start_idx]
-                self.program += f'call(Val(:{fragment})'
+                self.program.rewind(primary_start)
+                has_head = self._call_head(fragment)
                 if node.arguments.expressions:
-                    self.program += ', '
+                    if has_head:
+                        self.program += ', '
                     for i, expr in enumerate(node.arguments.expressions):
                         self.expression(expr)
                         if i < len(node.arguments.expressions) - 1:
@@ -621,8 +1449,8 @@ class Generator:
                 self.program += ')'
         elif node.subscript is not None:
             if node.primary_ and node.primary_.arguments and node.subscript.attr in methods_map:
-                fragment = self.program[primary_start_idx:]
-                self.program = self.program[:primary_start_idx]
+                fragment = self.program.since(primary_start)
+                self.program.rewind(primary_start)
                 self.program += f'{methods_map[node.subscript.attr]}({fragment}'
                 if len(node.primary_.arguments.expressions):
                     self.program += ', '
@@ -634,20 +1462,28 @@ class Generator:
                 self.program += ')'
             elif not (node.primary_ and node.primary_.arguments):
                 # доступ к полям
-                self.program = self.program[:primary_start_idx]
-                self.program += f'getattr({fragment}, :{node.subscript.attr})'
+                if not self._known_field(fragment, node.subscript.attr):
+                    self.program.rewind(primary_start)
+                    self.program += f'getattr({fragment}, :{node.subscript.attr})'
+                    self.uses_getattr = True
+                else:
+                    self.program += f'.{node.subscript.attr}'
         elif node.slices is not None:
             self.program += '['
             self.slices(node.slices)
             self.program += ']'
         if node.primary_:
-            self.primary_(node.primary_, primary_start_idx)
+            self.primary_(node.primary_, primary_start)
 
     def arguments(self, node: ArgumentsNode):
         for i, expression in enumerate(node.expressions):
             self.expression(expression)
             if i < len(node.expressions) - 1:
                 self.program += ', '
+        for i, keyword in enumerate(node.keywords):
+            self.program += '; ' if i == 0 else ', '
+            self.program += keyword.name.attr + '='
+            self.expression(keyword.expression)
 
     def slices(self, node: SlicesNode):
         for i, slice in enumerate(node.slices):
@@ -656,60 +1492,186 @@ class Generator:
                 self.program += ', '
 
     def slice(self, node: SliceNode):
-        if node.from_expression:
+        if id(node) in self.native_indices:
+            self.expression(node.from_expression)
+            return
+        if not node.is_range:
             self.expression(node.from_expression)
             self.program += '+ 1'
-        elif node.to_expression or node.step_expression:
-            self.program += '1'
-        if node.to_expression:
-            self.program += ':'
-            self.expression(node.to_expression)
-            self.program += ' - 1'
+            return
+
+        # a[i:j:k] -> a[i + 1:k:j]; для отрицательного шага границы по умолчанию меняются местами,
+        # а правая граница сдвигается в другую сторону
+        negative = isinstance(node.step_expression, FactorNode) and node.step_expression.op.attr == '-'
+        if node.from_expression:
+            self.expression(node.from_expression)
+            self.program += ' + 1'
+        else:
+            self.program += 'end' if negative else '1'
+        self.program += ':'
         if node.step_expression:
-            self.program += ':'
             self.expression(node.step_expression)
+            self.program += ':'
+        if node.to_expression:
+            self.expression(node.to_expression)
+            if negative:
+                self.program += ' + 2'
+        else:
+            self.program += '1' if negative else 'end'
             
 
-    def atom(self, node: AtomNode):
-        if isinstance(node.atom, IdentifierToken):
-            self.program += node.atom.attr
-        elif isinstance(node.atom, AtomKeywordToken):
-            if node.atom.attr == 'True':
+    def atom(self, node: Atom):
+        if isinstance(node, IdentifierToken):
+            self.program += node.attr
+        elif isinstance(node, AtomKeywordToken):
+            if node.attr == 'True':
                 self.program += 'true'
-            elif node.atom.attr == 'False':
+            elif node.attr == 'False':
                 self.program += 'false'
-            elif node.atom.attr == 'None':
+            elif node.attr == 'None':
                 self.program += 'nothing'
-        elif isinstance(node.atom, NumberToken):
-            self.program += str(node.atom.attr)
-        elif isinstance(node.atom, StringToken):
-            self.program += f'"{node.atom.attr}"'
-        elif isinstance(node.atom, FStringNode):
-            self.fstring(node.atom)
-        elif isinstance(node.atom, GroupNode):
-            self.group(node.atom)
-        elif isinstance(node.atom, ListNode):
-            self.list(node.atom)
-        elif isinstance(node.atom, NumpyNode):
-            self.numpy(node.atom)
-        elif isinstance(node.atom, BuiltinFunctionNode):
-            self.function(node.atom)
+        elif isinstance(node, NumberToken):
+            self.program += str(node.attr)
+        elif isinstance(node, StringToken):
+            self.program += f'"{node.attr}"'
+        elif isinstance(node, FStringNode):
+            self.fstring(node)
+        elif isinstance(node, GroupNode):
+            self.group(node)
+        elif isinstance(node, TupleNode):
+            self.tuple(node)
+        elif isinstance(node, ListNode):
+            self.list(node)
+        elif isinstance(node, NumpyNode):
+            self.numpy(node)
+        elif isinstance(node, BuiltinFunctionNode):
+            self.function(node)
 
     def numpy(self, node: NumpyNode):
-        self.function(node.function)
+        function = node.function
+        arguments = function.arguments
+        keywords = {keyword.name.attr: keyword.expression for keyword in arguments.keywords}
+        if function.name in reductions_map:
+            self.reduction(function, keywords)
+        elif function.name in ('zeros', 'ones'):
+            # np.zeros((m, n)) -> zeros((m, n)): Julia принимает форму кортежем
+            self.program += function.name + '('
+            if 'dtype' in keywords:
+                self.type(keywords['dtype'])
+                self.program += ', '
+            self.expression(arguments.expressions[0])
+            self.program += ')'
+        elif function.name == 'transpose' and (len(arguments.expressions) > 1 or 'axes' in keywords):
+            axes = arguments.expressions[1] if len(arguments.expressions) > 1 else keywords['axes']
+            self.program += 'permutedims('
+            self.expression(arguments.expressions[0])
+            self.program += ', '
+            self.expression(axes)
+            self.program += ' .+ 1)'
+        else:
+            self.function(function)
+
+    def reduction(self, node: BuiltinFunctionNode, keywords: Dict[str, Expression]):
+        name = reductions_map[node.name]
+        if name in statistics_functions:
+            self.uses_statistics = True
+        array = node.arguments.expressions[0]
+        axis = node.arguments.expressions[1] if len(node.arguments.expressions) > 1 else keywords.get('axis')
+
+        options = []
+        if name == 'std':
+            # NumPy по умолчанию считает смещенную оценку (ddof=0); Statistics умеет только ddof 0 и 1
+            ddof = keywords.get('ddof')
+            if ddof is None or isinstance(ddof, IntegerToken) and ddof.attr == 0:
+                options.append('corrected=false')
+            elif not (isinstance(ddof, IntegerToken) and ddof.attr == 1):
+                raise Exception('Unsupported ddof: only literal 0 or 1')
+        keepdims = keywords.get('keepdims')
+        if keepdims is not None and not (isinstance(keepdims, AtomKeywordToken) and keepdims.attr in ('True', 'False')):
+            raise Exception('Unsupported keepdims: only literal True or False')
+        # keepdims=True: Julia и так оставляет свернутые измерения, а без оси сворачиваются все
+        keep = keepdims is not None and keepdims.attr == 'True'
+        # отрицательная ось и все измерения читают ndims массива: выражение вычисляется один раз в let
+        negative = self._negative_axis(axis) \
+            or isinstance(axis, TupleNode) and any(self._negative_axis(expr) for expr in axis.expressions) \
+            or keep and axis is None
+        bind = negative and not isinstance(array, IdentifierToken)
+        if bind:
+            self.program += 'let a = '
+            self.expression(array)
+            self.program += '; '
+            array_name = 'a'
+        elif negative:
+            mark = self.program.mark()
+            self.expression(array)
+            array_name = self.program.since(mark)
+            self.program.rewind(mark)
+        else:
+            array_name = None
+
+        if axis is not None:
+            dims = self.axis(axis, array_name)
+            options.append(f'dims={dims}')
+            if not keep:
+                self.program += 'dropdims('
+        elif keep:
+            options.append(f'dims=Tuple(1:ndims({array_name}))')
+
+        self.program += name + '('
+        if array_name is None:
+            self.expression(array)
+        else:
+            self.program += array_name
+        if options:
+            self.program += '; ' + ', '.join(options)
+        self.program += ')'
+        if axis is not None and not keep:
+            self.program += f'; dims={dims})'
+        if bind:
+            self.program += ' end'
+
+    def _negative_axis(self, node: Expression):
+        return isinstance(node, FactorNode) and node.op.attr == '-' and isinstance(node.power, IntegerToken)
+
+    def axis(self, node: Expression, array: str):
+        # Номер измерения Julia для оси NumPy: оси считаются с нуля, отрицательные - с конца
+        if isinstance(node, IntegerToken):
+            return str(node.attr + 1)
+        if self._negative_axis(node):
+            return f'ndims({array})' + (f' - {node.power.attr - 1}' if node.power.attr > 1 else '')
+        if isinstance(node, TupleNode) \
+                and all(isinstance(expr, IntegerToken) or self._negative_axis(expr) for expr in node.expressions):
+            dims = [self.axis(expr, array) for expr in node.expressions]
+            return '(' + ', '.join(dims) + (',)' if len(dims) == 1 else ')')
+        # ось или кортеж осей, известные только при выполнении
+        mark = self.program.mark()
+        self.expression(node)
+        self.program += ' .+ 1'
+        dims = self.program.since(mark)
+        self.program.rewind(mark)
+        return dims
 
     def function(self, node: BuiltinFunctionNode):
         if node.name in tensor_op_map.keys():
             arguments = node.arguments
+            op = tensor_op_map[node.name]
+            if self.fused:
+                op = op.lstrip('.')
             for i, exp in enumerate(arguments.expressions):
-                self.expression(exp)
+                # аргумент-цепочка может связываться слабее самого оператора
+                if isinstance(exp, BinaryChainNode):
+                    self.program += '('
+                    self.expression(exp)
+                    self.program += ')'
+                else:
+                    self.expression(exp)
                 if i < len(arguments.expressions) - 1:
                     self.w()
-                    self.program += tensor_op_map[node.name]
+                    self.program += op
                     self.w()
 
         elif node.name in functions_map:
-            self.program += functions_map[node.name]
+            self.program += functions_map[node.name].rstrip('.') if self.fused else functions_map[node.name]
             self.program += '('
             self.arguments(node.arguments)
             self.program += ')'
@@ -747,9 +1709,9 @@ class Generator:
         for child in node.content:
             if isinstance(child, StringToken):
                 self.program += child.attr
-            elif isinstance(child, ExpressionNode):
+            elif isinstance(child, GroupNode):
                 self.program += '$('
-                self.expression(child)
+                self.expression(child.expression)
                 self.program += ')'
         self.program += '"'
 
@@ -758,14 +1720,25 @@ class Generator:
         self.expression(node.expression)
         self.program += ')'
 
+    def tuple(self, node: TupleNode):
+        self.program += '('
+        for i, expression in enumerate(node.expressions):
+            self.expression(expression)
+            if i < len(node.expressions) - 1:
+                self.program += ', '
+        if len(node.expressions) == 1:
+            self.program += ','
+        self.program += ')'
+
     def list(self, node: ListNode):
         self.program += '['
         if node.expressions:
             self.expressions(node.expressions)
         self.program += ']'
         
-    def type(self, node: TypeNode):
-        if node.type in types_map:
-            self.program += types_map[node.type]
+    def type(self, node: Union[TypeNode, TypeToken]):
+        type_ = node.type if isinstance(node, TypeNode) else node.attr
+        if self._julia_type(type_) is not None:
+            self.program += self._julia_type(type_)
         else:
             raise Exception('Unsupported type')
@@ -0,0 +1,266 @@
+import hashlib
+import pickle
+from typing import Dict, List, Optional, Tuple
+
+from compiler import Compiler
+from syntax_tree import *
+
+# Строки верхнего уровня, которые продолжают предыдущую конструкцию, а не начинают новую
+CONTINUATION_KEYWORDS = ('else', 'elif', 'except', 'finally')
+
+
+class Unit:
+    # Часть модуля: одно определение def/class верхнего уровня или подряд идущий код модуля
+    __slots__ = ('text', 'key', 'is_definition', 'class_name', 'super_name', 'statements', 'classes', 'functions')
+
+    def __init__(self, text: str, is_definition: bool):
+        self.text = text
+        self.is_definition = is_definition
+        self.key: str = None
+        self.class_name: Optional[str] = None
+        self.super_name: Optional[str] = None
+        self.statements: List[StatementNode] = []
+        # классы в порядке регистрации при разборе (вложенные раньше внешних) и все функции части
+        self.classes: List[ClassDefNode] = []
+        self.functions: List[FunctionDefNode] = []
+
+
+class GeneratedUnit:
+    # Результат генерации определения: текст, разрезанный в местах вставки getattr/setattr!,
+    # и побочные эффекты генератора, которые нужно повторить при повторном использовании
+    __slots__ = ('fingerprint', 'pieces', 'helpers', 'uses_getattr', 'uses_setattr', 'uses_statistics', 'declared')
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.pieces: List[str] = []
+        self.helpers: List[Tuple[str, str]] = []
+        self.uses_getattr = False
+        self.uses_setattr = False
+        self.uses_statistics = False
+        self.declared: List[str] = []
+
+
+class IncrementalCompiler:
+    # Повторная трансляция измененного модуля. Модуль делится на определения верхнего уровня и
+    # участки кода модуля; разобранное дерево каждой части хранится по хэшу ее текста (у класса - вместе
+    # с цепочкой предков, от полей которых зависит разбор), так что заново разбираются только
+    # измененные части. Вывод типов и граф вызовов по-прежнему строятся по всему модулю, а текст
+    # определения берется из прошлой трансляции, если не изменились ни сама часть, ни то, что генератор
+    # читает из анализа модуля. Код модуля генерируется всегда: он зависит от всех функций сразу
+
+    def __init__(self, val_dispatch=False):
+        self.val_dispatch = val_dispatch
+        # ключ части -> сериализованные операторы, классы и функции (pickle сохраняет общие ссылки);
+        # генератор изменяет дерево, поэтому каждая трансляция получает свою копию
+        self.trees: Dict[str, bytes] = {}
+        self.generated: Dict[str, GeneratedUnit] = {}
+        self.stats = {'parsed': 0, 'generated': 0, 'reused': 0}
+
+    def compile(self, program: str):
+        units = self.split(program)
+        try:
+            compiler = self.parse_units(units)
+        except Exception:
+            # части по отдельности не разбираются (например, многострочная строка с текстом
+            # в первой колонке) - транслируем модуль целиком, чтобы получить обычную ошибку
+            self.trees, self.generated = {}, {}
+            return Compiler(program, self.val_dispatch).compile()
+
+        tree = StatementsNode()
+        for unit in units:
+            tree.statements.extend(unit.statements)
+        if not tree.statements:
+            # пустой модуль парсер отвергает - ошибка та же, что у полной трансляции
+            return Compiler(program, self.val_dispatch).compile()
+        compiler.analyze(tree)
+        return self.generate(compiler, units)
+
+    def split(self, program: str):
+        # Части - точные куски исходника вместе с пустыми строками и комментариями: сканер
+        # чувствителен к переводам строк, и склеенные части должны давать исходный текст
+        units: List[Unit] = []
+        lines = program.splitlines(keepends=True)
+        current: List[str] = []
+        # сканер пересчитывает отступ только у строки с пробелами в начале или после пустой строки:
+        # строка в первой колонке сразу после тела блока остается в этом блоке
+        indented, measured = False, True
+        for line in lines:
+            if not line.strip():
+                measured = True
+            elif line[:1] in (' ', '\t'):
+                indented, measured = True, False
+            elif line[:1] != '#':
+                indented = indented and not measured
+                measured = False
+            starts = not indented and line[:1] not in ('', ' ', '\t', '\n', '\r', '#') \
+                and line.split(None, 1)[0].rstrip(':') not in CONTINUATION_KEYWORDS
+            if starts and current:
+                units.append(self.unit(current))
+                current = []
+            current.append(line)
+        if current:
+            units.append(self.unit(current))
+
+        # подряд идущий код модуля - одна часть: генератор смотрит на соседние операторы
+        merged: List[Unit] = []
+        for unit in units:
+            if not unit.is_definition and merged and not merged[-1].is_definition:
+                merged[-1] = Unit(merged[-1].text + unit.text, False)
+            else:
+                merged.append(unit)
+        return merged
+
+    def unit(self, lines: List[str]):
+        text = ''.join(lines)
+        head = text.split(None, 1)[0] if text.strip() else ''
+        return Unit(text, head in ('def', 'class'))
+
+    def parse_units(self, units: List[Unit]):
+        compiler = Compiler('', self.val_dispatch)
+        keys: Dict[str, str] = {}
+        trees: Dict[str, bytes] = {}
+        for unit in units:
+            head = unit.text.split('\n', 1)[0]
+            if head.startswith('class '):
+                name = head[6:].split('(', 1)[0].split(':', 1)[0].strip()
+                super_name = head.split('(', 1)[1].split(')', 1)[0].strip() if '(' in head else None
+                unit.class_name, unit.super_name = name, super_name or None
+
+            digest = hashlib.sha256(unit.text.encode())
+            if unit.super_name is not None:
+                # разбор класса копирует поля предка
+                digest.update(keys.get(unit.super_name, '').encode())
+            unit.key = digest.hexdigest()
+            if unit.class_name is not None:
+                keys[unit.class_name] = unit.key
+
+            data = self.trees.get(unit.key)
+            if data is None:
+                unit_compiler = Compiler(unit.text, self.val_dispatch)
+                unit_compiler.classes = compiler.classes
+                statements = unit_compiler.parse().statements
+                classes, functions = [], []
+                self.collect(statements, classes, functions)
+                data = pickle.dumps((statements, classes, functions))
+                self.stats['parsed'] += 1
+            trees[unit.key] = data
+            unit.statements, unit.classes, unit.functions = pickle.loads(data)
+            for class_node in unit.classes:
+                compiler.add_class(class_node)
+
+        self.trees = trees
+        return compiler
+
+    def collect(self, node, classes: List[ClassDefNode], functions: List[FunctionDefNode]):
+        # классы собираются в том же порядке, в каком их регистрирует парсер: вложенные раньше внешних
+        if isinstance(node, (list, tuple)):
+            for child in node:
+                self.collect(child, classes, functions)
+        elif isinstance(node, SyntaxNode):
+            if isinstance(node, FunctionDefNode):
+                functions.append(node)
+            for child in children(node):
+                self.collect(child, classes, functions)
+            if isinstance(node, ClassDefNode):
+                classes.append(node)
+
+    def generate(self, compiler: Compiler, units: List[Unit]):
+        generator = compiler.get_generator()
+        generator.tree = compiler.tree
+        interface = self.interface(compiler, generator)
+
+        # повторяет Generator.statements, но по частям
+        owners = {}
+        for unit in units:
+            for statement in unit.statements:
+                owners[id(statement)] = unit
+        statements = [statement for statement in compiler.tree.statements
+                      if not isinstance(statement.statement, CompoundStatementNode)
+                      or generator._reachable(statement.statement.compound_statement)]
+
+        generated: Dict[str, GeneratedUnit] = {}
+        for i, statement in enumerate(statements):
+            unit = owners[id(statement)]
+            if unit.is_definition:
+                fingerprint = self.fingerprint(unit, compiler, generator, interface)
+                cached = self.generated.get(unit.key)
+                if cached is not None and cached.fingerprint == fingerprint:
+                    self.replay(cached, generator)
+                    self.stats['reused'] += 1
+                else:
+                    cached = self.record(unit, statement, fingerprint, generator)
+                    self.stats['generated'] += 1
+                generated[unit.key] = cached
+            else:
+                if i < len(statements) - 1:
+                    generator._append_loop(statement, statements[i + 1])
+                generator.statement(statement)
+            if i < len(statements) - 1:
+                generator.nl()
+
+        self.generated = generated
+        return generator.finish()
+
+    def record(self, unit: Unit, statement: StatementNode, fingerprint: str, generator):
+        result = GeneratedUnit(fingerprint)
+        flags = generator.uses_getattr, generator.uses_setattr, generator.uses_statistics
+        generator.uses_getattr = generator.uses_setattr = generator.uses_statistics = False
+        declared = set(generator.declared_classes)
+        start, helpers = generator.program.mark(), len(generator.attr_helpers)
+
+        generator.statement(statement)
+
+        marks = [start] + [mark for mark, _, _ in generator.attr_helpers[helpers:]] + [generator.program.mark()]
+        result.pieces = [''.join(generator.program.chunks[a:b]) for a, b in zip(marks, marks[1:])]
+        result.helpers = [(getter, setter) for _, getter, setter in generator.attr_helpers[helpers:]]
+        result.uses_getattr, result.uses_setattr, result.uses_statistics = \
+            generator.uses_getattr, generator.uses_setattr, generator.uses_statistics
+        result.declared = sorted(generator.declared_classes - declared)
+
+        generator.uses_getattr = generator.uses_getattr or flags[0]
+        generator.uses_setattr = generator.uses_setattr or flags[1]
+        generator.uses_statistics = generator.uses_statistics or flags[2]
+        return result
+
+    def replay(self, cached: GeneratedUnit, generator):
+        generator.program += cached.pieces[0]
+        for (getter, setter), piece in zip(cached.helpers, cached.pieces[1:]):
+            generator.attr_helpers.append((generator.program.mark(), getter, setter))
+            generator.program += piece
+        generator.uses_getattr = generator.uses_getattr or cached.uses_getattr
+        generator.uses_setattr = generator.uses_setattr or cached.uses_setattr
+        generator.uses_statistics = generator.uses_statistics or cached.uses_statistics
+        generator.declared_classes.update(cached.declared)
+
+    def interface(self, compiler: Compiler, generator):
+        # Все, что генератор определения читает из анализа модуля помимо самого определения
+        inference, call_graph = compiler.inference, compiler.call_graph
+        classes = []
+        for name, node in compiler.classes.items():
+            classes.append((name, node.super_name.attr if node.super_name else None, sorted(node.attrs),
+                            sorted(node.attr2type.items()), node.has_dynamic_attrs, call_graph.is_reachable(node)))
+        value_names = set()
+        for env in inference.envs.values():
+            value_names.update(env)
+        methods = sorted((name, method.name.attr) for name, node in compiler.classes.items()
+                         for method in call_graph.class_methods(node) if call_graph.is_reachable_method(method))
+        state = (
+            classes,
+            sorted((root, sorted(fields.items(), key=repr)) for root, fields in inference.fields.items()),
+            sorted(value_names),
+            sorted(call_graph.explicit),
+            methods,
+            self.val_dispatch,
+        )
+        return hashlib.sha256(repr(state).encode()).hexdigest()
+
+    def fingerprint(self, unit: Unit, compiler: Compiler, generator, interface: str):
+        inference = compiler.inference
+        state = (
+            unit.key,
+            interface,
+            sorted(generator.declared_classes),
+            [(sorted(inference.envs.get(function, {}).items()), sorted(inference.appends.get(function, {}).items()))
+             for function in unit.functions],
+        )
+        return hashlib.sha256(repr(state).encode()).hexdigest()
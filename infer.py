@@ -0,0 +1,563 @@
+from typing import Dict, List, Optional, Set
+
+from syntax_tree import *
+
+# Типы выводятся в виде строк: 'int', 'float', 'str', 'bool', 'None', 'list', 'list[int]',
+# имя класса или ANY. None означает, что тип еще не известен (он может появиться на следующем проходе)
+ANY = 'Any'
+# массив NumPy; что он не скаляр, известно точно, а форма и тип элементов - нет
+ARRAY = 'ndarray'
+
+LITERAL_TYPES = {
+    IntegerToken: 'int',
+    FloatToken: 'float',
+    StringToken: 'str',
+}
+
+ANNOTATION_TYPES = ('int', 'float', 'str')
+SCALAR_TYPES = ('int', 'float', 'str', 'bool')
+# операнды, с которыми арифметика над массивом снова дает массив
+BROADCAST_TYPES = ('int', 'float', 'bool', ARRAY, ANY)
+
+
+class Scope:
+    def __init__(self, function: Optional[FunctionDefNode], class_node: Optional[ClassDefNode], env: Dict[str, str]):
+        self.function = function
+        self.class_node = class_node
+        self.env = env
+        self.assigned: Set[str] = set()
+
+
+class TypeInference:
+    MAX_PASSES = 10
+
+    def __init__(self, compiler):
+        self.compiler = compiler
+        self.functions: Dict[str, FunctionDefNode] = {}
+        self.methods: Dict[str, Dict[str, FunctionDefNode]] = {}
+        # корень иерархии -> имя поля (с учетом декорирования приватных) -> тип
+        self.fields: Dict[str, Dict[str, str]] = {}
+        # функция (None - модуль) -> имя переменной -> тип
+        self.envs: Dict[Optional[FunctionDefNode], Dict[str, str]] = {}
+        # функция -> имя списка -> тип элементов, добавляемых в него через append
+        self.appends: Dict[Optional[FunctionDefNode], Dict[str, str]] = {}
+        # __init__ -> место вызова -> типы аргументов; копится между проходами,
+        # чтобы вызовы из классов, обойденных позже, учитывались на следующем проходе
+        self.init_calls: Dict[FunctionDefNode, Dict[int, List[Optional[str]]]] = {}
+        # классы, которым где-то присваивается поле, не объявленное в __init__ и методах
+        self.dynamic: Set[str] = set()
+        self.changed = False
+
+    def infer(self, tree: StatementsNode):
+        for statement in tree.statements:
+            if isinstance(statement.statement, CompoundStatementNode):
+                compound = statement.statement.compound_statement
+                if isinstance(compound, FunctionDefNode):
+                    self.functions[compound.name.attr] = compound
+        for name, class_node in self.compiler.classes.items():
+            self.methods[name] = {method.name.attr: method for method in self.class_methods(class_node)}
+
+        for _ in range(self.MAX_PASSES):
+            self.changed = False
+
+            module = Scope(None, None, self.env(None))
+            self.collect_assigned(tree, module)
+            self.scope_statements(tree, module)
+            for function in self.functions.values():
+                self.function(function, None)
+            for class_node in self.compiler.classes.values():
+                for method in self.class_methods(class_node):
+                    self.function(method, class_node)
+
+            if not self.changed:
+                break
+
+        for name, class_node in self.compiler.classes.items():
+            for attr in class_node.attrs:
+                class_node.attr2type[attr] = self.field(name, self.mangle(name, attr)) or ANY
+            # объект наследника тоже может оказаться получателем динамического поля
+            class_node.has_dynamic_attrs = any(ancestor in self.dynamic for ancestor in self.ancestors(name))
+
+    def var_type(self, function: Optional[FunctionDefNode], name: str):
+        return self.envs.get(function, {}).get(name)
+
+    # Вспомогательные функции
+
+    def class_methods(self, class_node: ClassDefNode):
+        for statement in class_node.block.statements.statements:
+            if isinstance(statement.statement, CompoundStatementNode) \
+                    and isinstance(statement.statement.compound_statement, FunctionDefNode):
+                yield statement.statement.compound_statement
+
+    def env(self, function: Optional[FunctionDefNode]):
+        if function not in self.envs:
+            self.envs[function] = {}
+        return self.envs[function]
+
+    def mangle(self, class_name: str, attr: str):
+        if attr.startswith('__') and not attr.endswith('__'):
+            return f'_{class_name}{attr}'
+        return attr
+
+    def ancestors(self, class_name: str):
+        chain = []
+        while class_name in self.compiler.classes:
+            chain.append(class_name)
+            super_name = self.compiler.classes[class_name].super_name
+            class_name = super_name.attr if super_name else None
+        return chain
+
+    def root(self, class_name: str):
+        return self.ancestors(class_name)[-1]
+
+    def init_owner(self, class_name: str):
+        for name in self.ancestors(class_name):
+            if '__init__' in self.methods[name]:
+                return self.methods[name]['__init__']
+        return None
+
+    def join(self, a: Optional[str], b: Optional[str], numeric: bool = True):
+        # numeric=False не расширяет int до float: поле Float64 печатало бы 0 как 0.0
+        if a is None:
+            return b
+        if b is None or a == b:
+            return a
+        if ANY in (a, b):
+            return ANY
+        if numeric and {a, b} == {'int', 'float'}:
+            return 'float'
+        if a in self.compiler.classes and b in self.compiler.classes:
+            a_ancestors = self.ancestors(a)
+            for name in self.ancestors(b):
+                if name in a_ancestors:
+                    return name
+        return ANY
+
+    def field(self, class_name: str, key: str):
+        return self.fields.get(self.root(class_name), {}).get(key)
+
+    def assign_field(self, class_name: str, key: str, type_: Optional[str]):
+        fields = self.fields.setdefault(self.root(class_name), {})
+        joined = self.join(fields.get(key), type_, numeric=False)
+        if joined != fields.get(key):
+            fields[key] = joined
+            self.changed = True
+
+    def assign_var(self, scope: Scope, name: str, type_: Optional[str]):
+        joined = self.join(scope.env.get(name), type_)
+        if joined != scope.env.get(name):
+            scope.env[name] = joined
+            self.changed = True
+
+    # Обход функций и операторов
+
+    def function(self, node: FunctionDefNode, class_node: Optional[ClassDefNode]):
+        scope = Scope(node, class_node, self.env(node))
+        params = node.params.params if node.params else []
+
+        calls = None
+        if class_node is not None and node.name.attr == '__init__':
+            calls = list(self.init_calls.get(node, {}).values())
+
+        for i, param in enumerate(params):
+            name = param.name.attr
+            if class_node is not None and i == 0 and name == 'self':
+                scope.env[name] = class_node.name.attr
+            elif self.annotation(param.annotation) is not None:
+                scope.env[name] = self.annotation(param.annotation)
+            elif calls is not None and all(len(args) == len(params) - 1 for args in calls):
+                # тип параметра конструктора собирается по всем найденным вызовам
+                scope.assigned.add(name)
+                param_type = None
+                for args in calls:
+                    param_type = self.join(param_type, args[i - 1])
+                self.assign_var(scope, name, param_type)
+            else:
+                scope.env[name] = ANY
+
+        self.collect_assigned(node.block.statements, scope)
+        self.scope_statements(node.block.statements, scope)
+
+    def collect_assigned(self, node: StatementsNode, scope: Scope):
+        for statement in node.statements:
+            inner = statement.statement
+            if isinstance(inner, SimpleStatementNode) and isinstance(inner.simple_statement, AssignmentNode):
+                for decl in inner.simple_statement.declarations:
+                    if not decl.primary_:
+                        scope.assigned.add(decl.name)
+            elif isinstance(inner, CompoundStatementNode):
+                compound = inner.compound_statement
+                if isinstance(compound, ForStatementNode):
+                    scope.assigned.add(compound.name.attr)
+                for block in self.inner_blocks(compound):
+                    self.collect_assigned(block.statements, scope)
+
+    def inner_blocks(self, node):
+        if isinstance(node, (IfStatementNode, ElifStatementNode, WhileStatementNode, ForStatementNode)):
+            yield node.block
+            if node.else_block is not None:
+                yield from self.inner_blocks(node.else_block)
+        elif isinstance(node, ElseBlockNode):
+            yield node.block
+
+    def scope_statements(self, node: StatementsNode, scope: Scope):
+        for statement in node.statements:
+            inner = statement.statement
+            if isinstance(inner, SimpleStatementNode):
+                self.simple_statement(inner.simple_statement, scope)
+            elif isinstance(inner, CompoundStatementNode):
+                self.compound_statement(inner.compound_statement, scope)
+
+    def simple_statement(self, node, scope: Scope):
+        if isinstance(node, AssignmentNode):
+            self.assignment(node, scope)
+        elif isinstance(node, ExpressionsNode):
+            for expression in node.expressions:
+                self.type_of(expression, scope)
+        elif isinstance(node, ReturnStatementNode) and node.expressions is not None:
+            for expression in node.expressions.expressions:
+                self.type_of(expression, scope)
+        elif isinstance(node, SuperStatementNode):
+            self.super_stmt(node, scope)
+
+    def compound_statement(self, node, scope: Scope):
+        if isinstance(node, (FunctionDefNode, ClassDefNode)):
+            return
+        if isinstance(node, ForStatementNode):
+            self.assign_var(scope, node.name.attr, self.element_type(node.expressions, scope))
+        elif isinstance(node, (IfStatementNode, ElifStatementNode, WhileStatementNode)):
+            self.type_of(node.condition, scope)
+        for block in self.inner_blocks(node):
+            self.scope_statements(block.statements, scope)
+
+    def element_type(self, node: ExpressionsNode, scope: Scope):
+        if len(node.expressions) != 1:
+            return ANY
+        iterable = node.expressions[0]
+        if isinstance(iterable, BuiltinFunctionNode) and iterable.name == 'range':
+            self.type_of(iterable, scope)
+            return 'int'
+        iterable_type = self.type_of(iterable, scope)
+        if iterable_type is not None and iterable_type.startswith('list['):
+            return iterable_type[5:-1]
+        return None if iterable_type is None else ANY
+
+    def assignment(self, node: AssignmentNode, scope: Scope):
+        expressions = node.expressions.expressions
+        types = [self.type_of(expression, scope) for expression in expressions]
+        if len(types) != len(node.declarations):
+            types = [ANY] * len(node.declarations)
+            expressions = [None] * len(node.declarations)
+
+        for decl, type_, expression in zip(node.declarations, types, expressions):
+            annotation = self.annotation(decl.annotation)
+            if annotation is not None and annotation.startswith('list'):
+                # пустой литерал не противоречит объявленному типу элементов
+                type_ = annotation
+            elif annotation is not None:
+                type_ = self.join(type_, annotation)
+            if not decl.primary_:
+                if node.op.attr != '=':
+                    type_ = self.augmented(self.name_type(decl.name, scope), type_, node.op.attr)
+                self.assign_var(scope, decl.name, type_)
+                continue
+            if node.op.attr != '=':
+                type_ = ANY
+            elif type_ is not None and type_.startswith('list') and not isinstance(expression, ListNode):
+                # чужой список может иметь другой тип элементов, и поле Vector{T} получило бы его копию
+                type_ = ANY
+
+            last = decl.primary_
+            while last.primary_ is not None:
+                last = last.primary_
+            if last.subscript is None:
+                continue
+            if last is decl.primary_:
+                self.assign_attr(decl.name, last.subscript.attr, type_, scope)
+            else:
+                # запись в поле вложенного объекта: тип получателя не отслеживается
+                self.assign_attr(None, last.subscript.attr, type_, scope)
+
+    def assign_attr(self, receiver: Optional[str], attr: str, type_: Optional[str], scope: Scope):
+        if receiver == 'self' and scope.class_node is not None:
+            class_name = scope.class_node.name.attr
+            self.assign_field(class_name, self.mangle(class_name, attr), type_)
+            return
+
+        receiver_type = scope.env.get(receiver) if receiver in scope.env else ANY
+        if receiver_type in self.compiler.classes:
+            self.assign_field(receiver_type, attr, type_)
+            if attr not in self.compiler.classes[receiver_type].attrs:
+                self.dynamic.add(receiver_type)
+        elif receiver_type is not None:
+            # получатель неизвестен - поле с таким именем может оказаться в любом классе,
+            # а классы без такого поля получат его динамически
+            for name, class_node in self.compiler.classes.items():
+                if attr in class_node.attrs:
+                    self.assign_field(name, attr, type_)
+                else:
+                    self.dynamic.add(name)
+
+    def super_stmt(self, node: SuperStatementNode, scope: Scope):
+        call = node.super_call
+        if not (call.primary_ and call.primary_.arguments):
+            return
+        args = [self.type_of(expression, scope) for expression in call.primary_.arguments.expressions]
+
+        if call.subscript and call.subscript.attr == '__init__' and scope.class_node is not None:
+            if node.super_name:
+                super_name = node.super_name.attr
+            elif scope.class_node.super_name:
+                super_name = scope.class_node.super_name.attr
+            else:
+                return
+            self.record_init(node, super_name, args)
+
+    def record_init(self, site: SyntaxNode, class_name: str, args: List[Optional[str]]):
+        owner = self.init_owner(class_name)
+        if owner is not None:
+            calls = self.init_calls.setdefault(owner, {})
+            if calls.get(id(site)) != args:
+                calls[id(site)] = args
+                self.changed = True
+
+    # Выражения
+
+    def type_of(self, node: Expression, scope: Scope) -> Optional[str]:
+        if type(node) in LITERAL_TYPES:
+            return LITERAL_TYPES[type(node)]
+        if isinstance(node, AtomKeywordToken):
+            return 'None' if node.attr == 'None' else 'bool'
+        if isinstance(node, IdentifierToken):
+            return self.name_type(node.attr, scope)
+        if isinstance(node, FStringNode):
+            for child in node.content:
+                if isinstance(child, GroupNode):
+                    self.type_of(child.expression, scope)
+            return 'str'
+        if isinstance(node, GroupNode):
+            return self.type_of(node.expression, scope)
+        if isinstance(node, TupleNode):
+            for expression in node.expressions:
+                self.type_of(expression, scope)
+            return ANY
+        if isinstance(node, ListNode):
+            if not node.expressions:
+                return 'list'
+            element = None
+            for expression in node.expressions.expressions:
+                element = self.join(element, self.type_of(expression, scope))
+            if element is None:
+                return None
+            return 'list' if element in (ANY, 'None') else f'list[{element}]'
+        if isinstance(node, InversionNode):
+            self.type_of(node.comparison, scope)
+            return 'bool'
+        if isinstance(node, ComparisonNode):
+            # сравнение массивов дает массив, а не Bool
+            types = [self.type_of(operand, scope) for operand in node.operands]
+            if None in types:
+                return None
+            if ARRAY in types:
+                return self.broadcast(types)
+            return 'bool' if all(type_ in SCALAR_TYPES for type_ in types) else ANY
+        if isinstance(node, (DisjunctionNode, ConjunctionNode)):
+            result = None
+            for operand in node.operands:
+                result = self.join(result, self.type_of(operand, scope))
+            return result
+        if isinstance(node, (SumNode, TermNode)):
+            return self.arithmetic(node, scope)
+        if isinstance(node, FactorNode):
+            operand = self.type_of(node.power, scope)
+            return operand if operand in (None, 'int', 'float', ARRAY) else ANY
+        if isinstance(node, PowerNode):
+            base = self.type_of(node.primary, scope)
+            exponent = self.type_of(node.factor, scope)
+            if None in (base, exponent):
+                return None
+            if ARRAY in (base, exponent):
+                return self.broadcast([base, exponent])
+            return self.join(base, exponent) if {base, exponent} <= {'int', 'float'} else ANY
+        if isinstance(node, PrimaryNode):
+            return self.primary(node, scope)
+        if isinstance(node, NumpyNode):
+            arguments = node.function.arguments
+            types = self.arguments(arguments, scope)
+            if node.function.name in ('zeros', 'ones', 'transpose'):
+                return ARRAY
+            if node.function.name in NUMPY_ELEMENTWISE_FUNCTIONS:
+                return self.broadcast(types)
+            if node.function.name in NUMPY_REDUCTIONS:
+                # свертка по оси или с keepdims=True оставляет массив, свертка всего массива - число
+                if len(arguments.expressions) > 1 or any(k.name.attr == 'axis' for k in arguments.keywords) \
+                        or any(k.name.attr == 'keepdims' and isinstance(k.expression, AtomKeywordToken)
+                               and k.expression.attr == 'True' for k in arguments.keywords):
+                    return ARRAY
+                return 'float' if node.function.name in ('mean', 'median', 'std') else ANY
+            return ANY
+        if isinstance(node, BuiltinFunctionNode):
+            self.arguments(node.arguments, scope)
+            if node.name == 'len':
+                return 'int'
+            if node.name == 'str':
+                return 'str'
+            return ANY
+        return ANY
+
+    def arithmetic(self, node: BinaryChainNode, scope: Scope):
+        types = [self.type_of(operand, scope) for operand in node.operands]
+        if None in types:
+            return None
+        if ARRAY in types:
+            return self.broadcast(types)
+        if all(type_ == 'str' for type_ in types) and all(op.attr == '+' for op in node.ops):
+            return 'str'
+        if not all(type_ in ('int', 'float') for type_ in types):
+            return ANY
+        if any(op.attr == '//' for op in node.ops):
+            return ANY
+        if any(op.attr == '/' for op in node.ops):
+            return 'float'
+        return 'float' if 'float' in types else 'int'
+
+    def augmented(self, current: Optional[str], operand: Optional[str], op: str):
+        # x op= y имеет тип x op y
+        if None in (current, operand):
+            return None
+        if ARRAY in (current, operand):
+            return self.broadcast([current, operand])
+        if current == operand == 'str' and op == '+=':
+            return 'str'
+        if current in ('int', 'float') and operand in ('int', 'float'):
+            return 'float' if op == '/=' else self.join(current, operand)
+        return ANY
+
+    def broadcast(self, types: List[Optional[str]]):
+        # результат поэлементной операции: массив, если хотя бы один операнд - массив
+        if None in types:
+            return None
+        if ARRAY in types and all(type_ in BROADCAST_TYPES for type_ in types):
+            return ARRAY
+        return ANY
+
+    def name_type(self, name: str, scope: Scope):
+        if name in scope.env:
+            return scope.env[name]
+        if name in scope.assigned:
+            return None
+        return ANY
+
+    def arguments(self, node: Optional[ArgumentsNode], scope: Scope):
+        if node is None:
+            return []
+        for keyword in node.keywords:
+            if not isinstance(keyword.expression, TypeToken):
+                self.type_of(keyword.expression, scope)
+        return [self.type_of(expression, scope) for expression in node.expressions]
+
+    def primary(self, node: PrimaryNode, scope: Scope):
+        atom = node.atom
+        link = node.primary_
+
+        if isinstance(atom, IdentifierToken) and atom.attr in self.compiler.classes:
+            class_name = atom.attr
+            if link.arguments is not None:
+                # Вызов конструктора
+                self.record_init(node, class_name, self.arguments(link.arguments, scope))
+                current = class_name
+                link = link.primary_
+            elif link.subscript and link.primary_ and link.primary_.arguments is not None:
+                # Вызов метода через класс
+                args = self.arguments(link.primary_.arguments, scope)
+                if link.subscript.attr == '__init__':
+                    self.record_init(node, class_name, args[1:])
+                current = self.method_type(class_name, link.subscript.attr)
+                link = link.primary_.primary_
+            else:
+                current = ANY
+                link = link.primary_
+        elif isinstance(atom, IdentifierToken) and atom.attr in self.functions and link.arguments is not None:
+            self.arguments(link.arguments, scope)
+            current = self.return_type(self.functions[atom.attr])
+            link = link.primary_
+        else:
+            current = self.type_of(atom, scope)
+            if isinstance(atom, IdentifierToken) and link.subscript and link.subscript.attr == 'append' \
+                    and link.primary_ and link.primary_.arguments is not None \
+                    and len(link.primary_.arguments.expressions) == 1:
+                self.record_append(scope, atom.attr, self.type_of(link.primary_.arguments.expressions[0], scope))
+
+        while link is not None:
+            if link.subscript and link.primary_ and link.primary_.arguments is not None:
+                self.arguments(link.primary_.arguments, scope)
+                current = self.method_type(current, link.subscript.attr)
+                link = link.primary_.primary_
+                continue
+
+            if link.subscript:
+                if current in self.compiler.classes:
+                    attr = link.subscript.attr
+                    if isinstance(atom, IdentifierToken) and atom.attr == 'self' and scope.class_node is not None:
+                        attr = self.mangle(scope.class_node.name.attr, attr)
+                    current = self.field(current, attr)
+                elif current is not None:
+                    current = ANY
+            elif link.arguments is not None:
+                self.arguments(link.arguments, scope)
+                current = ANY
+            elif link.slices is not None:
+                for slice_node in link.slices.slices:
+                    for expression in (slice_node.from_expression, slice_node.to_expression,
+                                       slice_node.step_expression):
+                        if expression is not None:
+                            self.type_of(expression, scope)
+                current = ANY
+            link = link.primary_
+        return current
+
+    def record_append(self, scope: Scope, name: str, type_: Optional[str]):
+        appends = self.appends.setdefault(scope.function, {})
+        joined = self.join(appends.get(name), type_, numeric=False)
+        if joined != appends.get(name):
+            appends[name] = joined
+            self.changed = True
+
+    def list_element(self, function: Optional[FunctionDefNode], name: str):
+        # Тип элементов локального списка, если он известен и скалярный: пустой литерал
+        # получает тип от append, непустой - от своих элементов и append
+        type_ = self.var_type(function, name)
+        appended = self.appends.get(function, {}).get(name)
+        if type_ == 'list':
+            element = appended
+        elif type_ is not None and type_.startswith('list['):
+            element = self.join(type_[5:-1], appended, numeric=False)
+        else:
+            return None
+        return element if element in SCALAR_TYPES else None
+
+    def return_type(self, node: FunctionDefNode):
+        return self.annotation(node.return_type) or ANY
+
+    def annotation(self, node):
+        # Аннотация, которую понимает вывод типов: скаляр, list или list[скаляр]
+        if not isinstance(node, TypeNode):
+            return None
+        if node.type in ANNOTATION_TYPES or node.type == 'list':
+            return node.type
+        if node.type.startswith('list[') and node.type[5:-1] in ANNOTATION_TYPES:
+            return node.type
+        return None
+
+    def method_type(self, class_name: Optional[str], method: str):
+        if class_name is None:
+            return None
+        if class_name not in self.compiler.classes:
+            return ANY
+        # метод может быть переопределен в любом классе иерархии
+        result = None
+        root = self.root(class_name)
+        for name in self.compiler.classes:
+            if self.root(name) == root and method in self.methods[name]:
+                result = self.join(result, self.return_type(self.methods[name][method]))
+        return result or ANY
@@ -1,9 +1,10 @@
-from abc import ABC
-from copy import copy
+import re
 from enum import Enum
 
 
 class Position:
+    __slots__ = ('text', 'line', 'pos', 'idx')
+
     def __init__(self, text: str):
         self.text = text
         self.line = 1
@@ -24,6 +25,17 @@ class Position:
                     self.pos += 1
         return self
 
+    def jump(self, idx: int):
+        # перенос вперед сразу на idx с пересчетом строки и колонки по пропущенному участку
+        lines = self.text.count('\n', self.idx, idx)
+        if lines:
+            self.line += lines
+            self.pos = idx - self.text.rfind('\n', self.idx, idx)
+        else:
+            self.pos += idx - self.idx
+        self.idx = idx
+        return self
+
     def __eq__(self, other):
         if isinstance(other, Position):
             return self.idx == other.idx
@@ -53,18 +65,33 @@ class Position:
 
 
 class Fragment:
-    def __init__(self, start: Position, end: Position):
+    # Строка и колонка вычисляются по тексту при обращении: они нужны только сообщениям,
+    # а не каждому токену
+    __slots__ = ('text', 'start', 'end')
+
+    def __init__(self, text: str, start: int, end: int):
+        self.text = text
         self.start = start
         self.end = end
 
+    @property
+    def line(self):
+        return self.text.count('\n', 0, self.start) + 1
+
+    @property
+    def pos(self):
+        return self.start - self.text.rfind('\n', 0, self.start)
+
     def __str__(self):
-        return f'{self.start} - {self.end}'
+        return f'({self.line}, {self.pos})'
 
     def get(self):
-        return self.start.text[self.start.idx:self.end.idx]
+        return self.text[self.start:self.end]
 
 
 class Message:
+    __slots__ = ('text', 'pos', 'error')
+
     def __init__(self, text: str, pos: Position, error: bool = False):
         self.text = text
         self.pos = pos
@@ -130,6 +157,13 @@ NUMPY_FUNCTIONS = (
     'dot', 'zeros', 'ones', 'shape', 'transpose',
     'equal', 'less', 'greater', 'less_equal', 'greater_equal',
 )
+# Поэлементные функции NumPy: результат имеет форму аргументов после broadcasting
+NUMPY_ELEMENTWISE_FUNCTIONS = (
+    'subtract', 'multiply', 'divide', 'minimum', 'maximum', 'round', 'log', 'sin', 'cos',
+    'equal', 'less', 'greater', 'less_equal', 'greater_equal',
+)
+# Свертки NumPy: без оси дают число, с осью - массив
+NUMPY_REDUCTIONS = ('sum', 'min', 'max', 'mean', 'median', 'std')
 BUILTIN_FUNCTIONS = (
     'print', 'len', 'range', 'str'
 )
@@ -138,198 +172,481 @@ BUILTIN_METHODS = (
 )
 
 
-class Token(ABC):
-    def __init__(self, tag: DomainTag, start: Position, end: Position):
+class Token:
+    # Токен хранит границы лексемы сам, без отдельного объекта Fragment на каждый токен
+    __slots__ = ('tag', 'attr', 'text', 'start', 'end')
+
+    def __init__(self, tag: DomainTag, frag: Fragment):
         self.tag = tag
-        self.frag = Fragment(start, end)
         self.attr = None
+        self.text = frag.text
+        self.start = frag.start
+        self.end = frag.end
+
+    @property
+    def frag(self):
+        return Fragment(self.text, self.start, self.end)
 
 
 class IndentToken(Token):
-    def __init__(self, start: Position, end: Position):
-        super().__init__(DomainTag.INDENT, start, end)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment):
+        super().__init__(DomainTag.INDENT, frag)
 
 
 class DedentToken(Token):
-    def __init__(self, start: Position, end: Position):
-        super().__init__(DomainTag.DEDENT, start, end)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment):
+        super().__init__(DomainTag.DEDENT, frag)
 
 
 class NewlineToken(Token):
-    def __init__(self, start: Position, end: Position):
-        super().__init__(DomainTag.NEWLINE, start, end)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment):
+        super().__init__(DomainTag.NEWLINE, frag)
 
 
 class IdentifierToken(Token):
-    def __init__(self, start: Position, end: Position, name: str):
-        super().__init__(DomainTag.IDENTIFIER, start, end)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment, name: str):
+        super().__init__(DomainTag.IDENTIFIER, frag)
         self.attr = name
 
 
 class NumpyToken(Token):
-    def __init__(self, start: Position, end: Position):
-        super().__init__(DomainTag.NUMPY, start, end)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment):
+        super().__init__(DomainTag.NUMPY, frag)
         
 class DecoratorToken(Token):
-    def __init__(self, start:Position, end:Position, kind: str):
-        super().__init__(DomainTag.DECORATOR, start, end)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment, kind: str):
+        super().__init__(DomainTag.DECORATOR, frag)
         self.attr = kind
 
 
 class FunctionToken(Token):
-    def __init__(self, start: Position, end: Position, kind: str):
-        super().__init__(DomainTag.FUNCTION, start, end)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment, kind: str):
+        super().__init__(DomainTag.FUNCTION, frag)
         self.attr = kind
 
 
 class KeywordToken(Token):
-    def __init__(self, start: Position, end: Position, kind: str, tag: DomainTag = DomainTag.KEYWORD):
-        super().__init__(DomainTag.KEYWORD, start, end)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment, kind: str, tag: DomainTag = DomainTag.KEYWORD):
+        super().__init__(DomainTag.KEYWORD, frag)
         self.attr = kind
         
 class TypeToken(Token):
-    def __init__(self, start, end, kind):
-        super().__init__(DomainTag.TYPE, start, end)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment, kind):
+        super().__init__(DomainTag.TYPE, frag)
         self.attr = kind
 
 
 class AtomKeywordToken(KeywordToken):
-    def __init__(self, start: Position, end: Position, kind: str):
-        super().__init__(start, end, kind, tag=DomainTag.ATOM_KEYWORD)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment, kind: str):
+        super().__init__(frag, kind, tag=DomainTag.ATOM_KEYWORD)
 
 
 class SimpleStmtKeywordToken(KeywordToken):
-    def __init__(self, start: Position, end: Position, kind: str):
-        super().__init__(start, end, kind, tag=DomainTag.SIMPLE_STMT_KEYWORD)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment, kind: str):
+        super().__init__(frag, kind, tag=DomainTag.SIMPLE_STMT_KEYWORD)
 
 
 class CompoundStmtKeywordToken(KeywordToken):
-    def __init__(self, start: Position, end: Position, kind: str):
-        super().__init__(start, end, kind, tag=DomainTag.COMPOUND_STMT_KEYWORD)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment, kind: str):
+        super().__init__(frag, kind, tag=DomainTag.COMPOUND_STMT_KEYWORD)
         
 class SuperKeywordToken(KeywordToken):
-    def __init__(self, start, end, kind):
-        super().__init__(start, end, kind, tag=DomainTag.SUPER_KEYWORD)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment, kind):
+        super().__init__(frag, kind, tag=DomainTag.SUPER_KEYWORD)
 
 
 class StringToken(Token):
-    def __init__(self, start: Position, end: Position, content: str):
-        super().__init__(DomainTag.STRING, start, end)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment, content: str):
+        super().__init__(DomainTag.STRING, frag)
         self.attr = content
         
 class FStringToken(Token):
-    def __init__(self, start: Position, end: Position):
-        super().__init__(DomainTag.FSTRING, start, end)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment):
+        super().__init__(DomainTag.FSTRING, frag)
         
 class FStringExprToken(Token):
-    def __init__(self, start: Position, end: Position):
-        super().__init__(DomainTag.FSTRING_EXPR, start, end)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment):
+        super().__init__(DomainTag.FSTRING_EXPR, frag)
 
 class NumberToken(Token):
-    def __init__(self, start: Position, end: Position, number, tag=DomainTag.NUMBER):
-        super().__init__(tag, start, end)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment, number, tag=DomainTag.NUMBER):
+        super().__init__(tag, frag)
         self.attr = number
 
 
 class IntegerToken(NumberToken):
-    def __init__(self, start: Position, end: Position, number):
-        super().__init__(start, end, number, tag=DomainTag.INTEGER)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment, number):
+        super().__init__(frag, number, tag=DomainTag.INTEGER)
 
 
 class FloatToken(NumberToken):
-    def __init__(self, start: Position, end: Position, number):
-        super().__init__(start, end, number, tag=DomainTag.FLOAT)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment, number):
+        super().__init__(frag, number, tag=DomainTag.FLOAT)
 
 
 class OperatorToken(Token):
-    def __init__(self, start: Position, end: Position, kind, tag=DomainTag.OPERATOR):
-        super().__init__(tag, start, end)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment, kind, tag=DomainTag.OPERATOR):
+        super().__init__(tag, frag)
         self.attr = kind
 
 
 class SumOperatorToken(OperatorToken):
-    def __init__(self, start: Position, end: Position, kind):
-        super().__init__(start, end, kind, DomainTag.SUM_OP)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment, kind):
+        super().__init__(frag, kind, DomainTag.SUM_OP)
 
 
 class MulOperatorToken(OperatorToken):
-    def __init__(self, start: Position, end: Position, kind):
-        super().__init__(start, end, kind, DomainTag.MUL_OP)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment, kind):
+        super().__init__(frag, kind, DomainTag.MUL_OP)
 
 
 class PowerOperatorToken(OperatorToken):
-    def __init__(self, start: Position, end: Position):
-        super().__init__(start, end, '**', DomainTag.POWER_OP)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment):
+        super().__init__(frag, '**', DomainTag.POWER_OP)
 
 
 class ComparisonOperatorToken(OperatorToken):
-    def __init__(self, start: Position, end: Position, kind):
-        super().__init__(start, end, kind, DomainTag.COMPARISON_OPERATORS)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment, kind):
+        super().__init__(frag, kind, DomainTag.COMPARISON_OPERATORS)
 
 
 class DelimiterToken(Token):
-    def __init__(self, start: Position, end: Position, kind):
-        super().__init__(DomainTag.DELIMITER, start, end)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment, kind):
+        super().__init__(DomainTag.DELIMITER, frag)
         self.attr = kind
 
 class CommentToken(Token):
-    def __init__(self, start, end):
-        super().__init__(DomainTag.COMMENT, start, end)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment):
+        super().__init__(DomainTag.COMMENT, frag)
 
 class EofToken(Token):
-    def __init__(self, start: Position, end: Position):
-        super().__init__(DomainTag.EOF, start, end)
+    __slots__ = ()
+
+    def __init__(self, frag: Fragment):
+        super().__init__(DomainTag.EOF, frag)
+
+
+# Таблицы быстрого пути лексера
+BLANK_LINES_RE = re.compile(r'(?: *\r?\n)*( *)')
+
+KEYWORD_TOKENS = {}
+for _kw in KEYWORDS:
+    if _kw in ATOM_KEYWORDS:
+        KEYWORD_TOKENS[_kw] = AtomKeywordToken
+    elif _kw in SIMPLE_STMT_KEYWORDS:
+        KEYWORD_TOKENS[_kw] = SimpleStmtKeywordToken
+    elif _kw in COMPOUND_STMT_KEYWORDS:
+        KEYWORD_TOKENS[_kw] = CompoundStmtKeywordToken
+    elif _kw in SUPER_KEYWORD:
+        KEYWORD_TOKENS[_kw] = SuperKeywordToken
+    else:
+        KEYWORD_TOKENS[_kw] = KeywordToken
+TYPE_NAMES = frozenset(TYPES)
+FUNCTION_NAMES = frozenset(BUILTIN_FUNCTIONS + NUMPY_FUNCTIONS + BUILTIN_METHODS)
+SPECIAL_WORDS = frozenset(KEYWORD_TOKENS) | TYPE_NAMES | FUNCTION_NAMES | {'np'}
+
+OPERATOR_TOKENS = {
+    '**': PowerOperatorToken, '//': MulOperatorToken,
+    '<<': OperatorToken, '>>': OperatorToken, ':=': OperatorToken,
+    '<=': ComparisonOperatorToken, '>=': ComparisonOperatorToken,
+    '==': ComparisonOperatorToken, '!=': ComparisonOperatorToken,
+    '->': DelimiterToken, '+=': DelimiterToken, '-=': DelimiterToken,
+    '*=': DelimiterToken, '/=': DelimiterToken, '%=': DelimiterToken,
+    '+': SumOperatorToken, '-': SumOperatorToken,
+    '*': MulOperatorToken, '/': MulOperatorToken, '%': MulOperatorToken,
+    '<': ComparisonOperatorToken, '>': ComparisonOperatorToken,
+    '&': OperatorToken, '^': OperatorToken,
+    '(': DelimiterToken, ')': DelimiterToken, '[': DelimiterToken, ']': DelimiterToken,
+    '{': DelimiterToken, '}': DelimiterToken, ':': DelimiterToken, '.': DelimiterToken,
+    ';': DelimiterToken, ',': DelimiterToken, '=': DelimiterToken,
+}
+
+
+def _kind(cls, lexeme: str):
+    # (класс, тег, значение) - то, что записал бы в токен конструктор класса
+    token = cls(Fragment('', 0, 0)) if cls in (NumpyToken, PowerOperatorToken) else cls(Fragment('', 0, 0), lexeme)
+    return cls, token.tag, token.attr
+
+
+WORD_KINDS = {word: _kind(cls, word) for word, cls in KEYWORD_TOKENS.items()}
+WORD_KINDS.update((name, _kind(FunctionToken, name)) for name in FUNCTION_NAMES)
+WORD_KINDS['np'] = _kind(NumpyToken, 'np')
+OPERATOR_KINDS = {op: _kind(cls, op) for op, cls in OPERATOR_TOKENS.items()}
+
+
+def fast_kind(kind: str, lexeme: str, match, following: str):
+    # (класс, тег, значение) токена быстрого пути; following - символ после лексемы
+    if kind == 'word':
+        if lexeme in TYPE_NAMES and following != '(':
+            return TypeToken, DomainTag.TYPE, lexeme
+        return WORD_KINDS.get(lexeme) or (IdentifierToken, DomainTag.IDENTIFIER, lexeme)
+    if kind == 'operator':
+        return OPERATOR_KINDS[lexeme]
+    if kind == 'number':
+        if match.group('fraction'):
+            return FloatToken, DomainTag.FLOAT, float(lexeme)
+        return IntegerToken, DomainTag.INTEGER, int(lexeme)
+    return NewlineToken, DomainTag.NEWLINE, None
+
+
+TOKEN_RE = re.compile(
+    r' *(?:'
+    r'(?P<word>[^\W\d]\w*)'
+    r'|(?P<number>(?:0|[1-9]\d*)(?P<fraction>\.\d+|e[+-]?\d+)?(?![\w.]))'
+    r'|(?P<newline>\r?\n)'
+    r'|(?P<operator>' + '|'.join(re.escape(op) for op in sorted(OPERATOR_TOKENS, key=len, reverse=True)) + r'))'
+)
+
+WORD_GROUP = TOKEN_RE.groupindex['word']
+OPERATOR_GROUP = TOKEN_RE.groupindex['operator']
 
 
 class Scanner:
     indents = [0]
     INDENT_BASE = 4
 
-    def __init__(self, program: str, compiler):
+    def __init__(self, program: str, compiler, fast: bool = True):
         self.program = program
+        self.fast = fast
         self.cur = Position(program)
         self.compiler = compiler
         self.last_indent = 0
         self.indents = [0]
         self.fstring = False
         self.fstring_expr = False
+        self.start = 0
+
+    def _begin(self):
+        self.start = self.cur.idx
+
+    def _frag(self):
+        return Fragment(self.program, self.start, self.cur.idx)
+
+    def _lexeme(self, skip: int = 0):
+        return self.program[self.start + skip:self.cur.idx]
+
+    def _fast_token(self):
+        # пробелы, идентификаторы, числа, переводы строк и операторы: одно совпадение регулярного выражения
+        # и поиск по таблице вместо посимвольного обхода
+        cur = self.cur
+        match = TOKEN_RE.match(self.program, cur.idx)
+        if match is None:
+            return None
+        kind = match.lastgroup
+        lexeme = match.group(kind)
+        end = match.end()
+        start = end - len(lexeme)
+        # совпадение не пересекает переводов строк, кроме самого токена newline: позиция считается
+        # сложением, без Position.jump
+        if kind == 'newline':
+            cur.line += 1
+            cur.pos = 1
+        else:
+            cur.pos += end - cur.idx
+        cur.idx = end
+        self.start = start
+        if kind == 'word' and lexeme == 'f' and cur.cp() in ('\'', '"'):
+            self.cur += 1
+            self.fstring = True
+            return FStringToken(self._frag())
+        cls, tag, attr = fast_kind(kind, lexeme, match, self.program[end])
+        token = object.__new__(cls)
+        token.tag = tag
+        token.attr = attr
+        token.text = self.program
+        token.start = start
+        token.end = end
+        return token
+
+    def tokens(self):
+        # поток токенов без комментариев, выдается по мере сканирования
+        # виды токенов сравниваются по тегу: это дешевле isinstance на каждом токене
+        tag = None
+        nl = True
+        dedent = False
+        fast = self.fast
+        program, cur = self.program, self.cur
+        match_token = TOKEN_RE.match
+        new = object.__new__
+        while tag is not DomainTag.EOF:
+            if fast and not self.fstring:
+                # отступы разбираются так же, как в next_token; ошибку отступа и конец программы
+                # оставляем ему
+                idx = cur.idx
+                if dedent:
+                    if program[idx] == '$':
+                        idx = None
+                    elif self.last_indent < self.indents[-1]:
+                        self.indents = self.indents[:-1]
+                        yield DedentToken(Fragment(program, idx, idx))
+                        continue
+                    else:
+                        if self.last_indent > self.indents[-1]:
+                            self.indents.append(self.last_indent)
+                        dedent = False
+                elif nl and (program[idx] in (' ', '\n') or program.startswith('\r\n', idx)):
+                    blank = BLANK_LINES_RE.match(program, idx)
+                    ws = blank.end(1) - blank.start(1)
+                    if ws % self.INDENT_BASE:
+                        idx = None
+                    else:
+                        indent = self.last_indent = ws // self.INDENT_BASE
+                        cur.jump(blank.end())
+                        if indent != self.indents[-1]:
+                            if indent > self.indents[-1]:
+                                self.indents.append(indent)
+                                tag = DomainTag.INDENT
+                                yield IndentToken(Fragment(program, idx, cur.idx))
+                            else:
+                                self.indents = self.indents[:-1]
+                                tag = DomainTag.DEDENT
+                                yield DedentToken(Fragment(program, idx, cur.idx))
+                            nl = False
+                            dedent = tag is DomainTag.DEDENT
+                            continue
+                        idx = cur.idx
+
+                # остаток строки разбирается здесь, без вызова методов сканера и конструкторов:
+                # на токен одно совпадение регулярного выражения и поиск по таблице.
+                # Позиция сканера обновляется один раз, когда цикл остановится
+                start = idx
+                while idx is not None:
+                    match = match_token(program, idx)
+                    if match is None:
+                        break
+                    group = match.lastindex
+                    lexeme = match[group]
+                    end = match.end()
+                    if group == OPERATOR_GROUP:
+                        cls, tag, attr = OPERATOR_KINDS[lexeme]
+                    elif group == WORD_GROUP and lexeme not in SPECIAL_WORDS:
+                        if lexeme == 'f' and program[end] in ('\'', '"'):
+                            # f-строку разбирает next_token
+                            break
+                        cls, tag, attr = IdentifierToken, DomainTag.IDENTIFIER, lexeme
+                    else:
+                        cls, tag, attr = fast_kind(match.lastgroup, lexeme, match, program[end])
+                    token = new(cls)
+                    token.tag = tag
+                    token.attr = attr
+                    token.text = program
+                    token.start = end - len(lexeme)
+                    token.end = idx = end
+                    yield token
+                    if tag is DomainTag.NEWLINE:
+                        break
+                if idx != start:
+                    if tag is DomainTag.NEWLINE:
+                        cur.line += 1
+                        cur.pos = 1
+                        cur.idx = idx
+                        nl = True
+                        continue
+                    cur.pos += idx - cur.idx
+                    cur.idx = idx
+                    nl = False
+
+            # next_token нужен для смены отступа, строк, комментариев и конца программы
+            token = self.next_token(nl, dedent)
+            tag = token.tag
+            if tag is DomainTag.COMMENT:
+                continue
+            yield token
+
+            nl = tag is DomainTag.NEWLINE
+            dedent = tag is DomainTag.DEDENT
 
     def next_token(self, nl=False, dedent=False) -> Token:
         while self.cur.cp() != '$':
 
-            start = copy(self.cur)
+            self._begin()
             
             if self.fstring:
                 if self.cur.cp() == '{':
                     self.fstring_expr = True
                     self.cur += 1
-                    return FStringExprToken(start, copy(self.cur))
+                    return FStringExprToken(self._frag())
                 elif self.fstring_expr and self.cur.cp() == '}':
                     self.fstring_expr = False
                     self.cur += 1
-                    return FStringExprToken(start, copy(self.cur))
+                    return FStringExprToken(self._frag())
                 if not self.fstring_expr:
                     if self.cur.cp() in ('"', '\''):
                         self.cur += 1
                         self.fstring = False
-                        return FStringToken(start, copy(self.cur))
+                        return FStringToken(self._frag())
                     
                     prev_c = None
-                    cum = ""
                     while self.cur.cp() not in ('{', '"', '\'') or prev_c == '\\':
                         prev_c = self.cur.cp()
-                        cum += prev_c
                         self.cur += 1
-                    return StringToken(start, copy(self.cur), cum)
+                    return StringToken(self._frag(), self._lexeme())
                     
 
             if dedent:
                 if self.last_indent < self.indents[-1]:
                     self.indents = self.indents[:-1]
-                    return DedentToken(start, copy(self.cur))
+                    return DedentToken(self._frag())
                 elif self.last_indent > self.indents[-1]:
                     self.indents.append(self.last_indent)
 
+            if self.fast and not nl:
+                token = self._fast_token()
+                if token:
+                    return token
+
             if not nl:
                 while self.cur.isWs() or self.cur.cp() == '\\':
                     if self.cur.isWs():
@@ -342,17 +659,23 @@ class Scanner:
 
                         if self.cur.isNl():
                             self.cur += 1
+                self._begin()
 
             if (self.cur.isWs() or self.cur.isNl()) and nl:
-                ws = 0
-                while self.cur.isWs() or self.cur.isNl():
-                    while self.cur.isWs():
-                        ws += 1
-                        self.cur += 1
+                if self.fast:
+                    blank = BLANK_LINES_RE.match(self.program, self.cur.idx)
+                    self.cur.jump(blank.end())
+                    ws = blank.end(1) - blank.start(1)
+                else:
+                    ws = 0
+                    while self.cur.isWs() or self.cur.isNl():
+                        while self.cur.isWs():
+                            ws += 1
+                            self.cur += 1
 
-                    if self.cur.isNl():
-                        ws = 0
-                        self.cur += 1
+                        if self.cur.isNl():
+                            ws = 0
+                            self.cur += 1
 
                 if ws % self.INDENT_BASE:
                     raise Exception('Invalid indentation')
@@ -362,103 +685,93 @@ class Scanner:
                 self.last_indent = indent
                 if indent > self.indents[-1]:
                     self.indents.append(indent)
-                    return IndentToken(start, copy(self.cur))
+                    return IndentToken(self._frag())
                 elif indent < self.indents[-1]:
                     self.indents = self.indents[:-1]
-                    return DedentToken(start, copy(self.cur))
+                    return DedentToken(self._frag())
+
+            elif self.fast and nl and (token := self._fast_token()):
+                return token
 
             elif self.cur.isNl():
                 self.cur += 1
-                return NewlineToken(start, copy(self.cur))
+                return NewlineToken(self._frag())
 
             elif self.cur.isLetter():
-                cum = ''
                 while self.cur.isLetterOrDigit():
-                    cum += self.cur.cp()
                     self.cur += 1
+                cum = self._lexeme()
 
                 if cum == 'f' and self.cur.cp() in ('\'', '"'):
                     self.cur += 1
                     self.fstring = True
-                    return FStringToken(start, copy(self.cur))
+                    return FStringToken(self._frag())
                 if cum in KEYWORDS:
                     if cum in ATOM_KEYWORDS:
-                        return AtomKeywordToken(start, copy(self.cur), cum)
+                        return AtomKeywordToken(self._frag(), cum)
                     if cum in SIMPLE_STMT_KEYWORDS:
-                        return SimpleStmtKeywordToken(start, copy(self.cur), cum)
+                        return SimpleStmtKeywordToken(self._frag(), cum)
                     if cum in COMPOUND_STMT_KEYWORDS:
-                        return CompoundStmtKeywordToken(start, copy(self.cur), cum)
+                        return CompoundStmtKeywordToken(self._frag(), cum)
                     if cum in SUPER_KEYWORD:
-                        return SuperKeywordToken(start, copy(self.cur), cum)
-                    return KeywordToken(start, copy(self.cur), cum)
+                        return SuperKeywordToken(self._frag(), cum)
+                    return KeywordToken(self._frag(), cum)
                 elif cum in TYPES and self.cur.cp() != '(':
-                    return TypeToken(start, copy(self.cur), cum)
+                    return TypeToken(self._frag(), cum)
                 elif cum == 'np':
-                    return NumpyToken(start, copy(self.cur))
+                    return NumpyToken(self._frag())
                 elif cum in BUILTIN_FUNCTIONS or cum in NUMPY_FUNCTIONS or cum in BUILTIN_METHODS:
-                    return FunctionToken(start, copy(self.cur), cum)
+                    return FunctionToken(self._frag(), cum)
                 else:
-                    return IdentifierToken(start, copy(self.cur), cum)
+                    return IdentifierToken(self._frag(), cum)
 
             elif self.cur.cp() == '#':
-                cum = ''
                 self.cur += 1
                 while not self.cur.isNl():
-                    cum += self.cur.cp()
                     self.cur += 1
                     
-                return CommentToken(start, copy(self.cur))
+                return CommentToken(self._frag())
                 
             elif self.cur.cp().isdigit():
-                cum = ''
                 while self.cur.cp().isdigit():
-                    cum += self.cur.cp()
                     self.cur += 1
-                if len(cum) > 1 and cum[0] == '0':
+                if self.cur.idx - self.start > 1 and self.program[self.start] == '0':
                     raise Exception('Decimal cannot starts with zero')
 
                 if self.cur.cp() == '.':
-                    cum += self.cur.cp()
                     self.cur += 1
                     if self.cur.cp().isdigit():
                         while self.cur.cp().isdigit():
-                            cum += self.cur.cp()
                             self.cur += 1
                         if self.cur.isLetter():
                             raise Exception('Invalid identifier')
-                        return FloatToken(start, copy(self.cur), float(cum))
+                        return FloatToken(self._frag(), float(self._lexeme()))
                     else:
                         raise Exception('Invalid number')
                 elif self.cur.cp() == 'e':
-                    cum += self.cur.cp()
                     self.cur += 1
 
                     if self.cur.cp() in ('+', '-'):
-                        cum += self.cur.cp()
                         self.cur += 1
 
                     if not self.cur.cp().isdigit():
                         raise Exception('Invalid mantis')
                     while self.cur.cp().isdigit():
-                        cum += self.cur.cp()
                         self.cur += 1
                     if self.cur.isLetter():
                         raise Exception('Invalid mantis')
 
-                    return FloatToken(start, copy(self.cur), float(cum))
+                    return FloatToken(self._frag(), float(self._lexeme()))
 
                 elif self.cur.isLetter():
                     raise Exception('Invalid identifier')
                 else:
-                    return IntegerToken(start, copy(self.cur), int(cum))
+                    return IntegerToken(self._frag(), int(self._lexeme()))
 
             elif self.cur.cp() == '\'' or self.cur.cp() == '"':
                 quote = self.cur.cp()
-                cum = ''
                 self.cur += 1
                 while self.cur.cp() != quote and self.cur.cp() != '\n' and self.cur.cp() != -1:
-                    cum += self.cur.cp()
-
                     if self.cur.cp() == '\\':
                         self.cur += 1
                         if self.cur.isNl():
@@ -469,7 +782,7 @@ class Scanner:
                     raise Exception('Invalid string literal')
                 
                 self.cur += 1
-                return StringToken(start, copy(self.cur), cum)
+                return StringToken(self._frag(), self.program[self.start + 1:self.cur.idx - 1])
             elif self.cur.cp() in SPEC_SYMBOLS:
                 cum = ''
                 cum += self.cur.cp()
@@ -485,43 +798,76 @@ class Scanner:
                     self.cur += 1
 
                     if cum == '**':
-                        return PowerOperatorToken(start, copy(self.cur))
+                        return PowerOperatorToken(self._frag())
                     elif cum == '//':
-                        return MulOperatorToken(start, copy(self.cur), cum)
+                        return MulOperatorToken(self._frag(), cum)
                     elif cum in COMPARISON_OPERATORS:
-                        return ComparisonOperatorToken(start, copy(self.cur), cum)
+                        return ComparisonOperatorToken(self._frag(), cum)
 
-                    return OperatorToken(start, copy(self.cur), cum)
+                    return OperatorToken(self._frag(), cum)
 
                 if (cum == '-' and self.cur.cp() == '>') or \
                         (cum in BINOP_SYMBOLS and self.cur.cp() == '='):
                     cum += self.cur.cp()
                     self.cur += 1
-                    return DelimiterToken(start, copy(self.cur), cum)
+                    return DelimiterToken(self._frag(), cum)
 
                 if cum in SUM_OPERATORS:
-                    return SumOperatorToken(start, copy(self.cur), cum)
+                    return SumOperatorToken(self._frag(), cum)
                 if cum in MUL_OPERATORS:
-                    return MulOperatorToken(start, copy(self.cur), cum)
+                    return MulOperatorToken(self._frag(), cum)
                 if cum in COMPARISON_OPERATORS:
-                    return ComparisonOperatorToken(start, copy(self.cur), cum)
+                    return ComparisonOperatorToken(self._frag(), cum)
                 if cum in OPERATORS:
-                    return OperatorToken(start, copy(self.cur), cum)
+                    return OperatorToken(self._frag(), cum)
                 if cum in DELIMITERS:
-                    return DelimiterToken(start, copy(self.cur), cum)
+                    return DelimiterToken(self._frag(), cum)
                 
             elif self.cur.cp() == '@':
-                cum = ''
                 self.cur += 1
                 while self.cur.isLetterOrDigit():
-                    cum += self.cur.cp()
                     self.cur += 1
                     
-                return DecoratorToken(start, copy(self.cur), cum)
+                return DecoratorToken(self._frag(), self._lexeme(skip=1))
             else:
                 raise Exception(f'Unexpected symbol: {self.cur.cp()}')
 
+        self._begin()
         if len(self.indents) > 1:
             self.indents = self.indents[:-1]
-            return DedentToken(copy(self.cur), copy(self.cur))
-        return EofToken(copy(self.cur), copy(self.cur))
+            return DedentToken(self._frag())
+        return EofToken(self._frag())
+
+
+class TokenStream:
+    # Окно просмотра вперед над потоком токенов: список с номером первого неразобранного токена.
+    # Когда все токены окна разобраны, список очищается, так что в памяти остается только окно
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+        self.window = []
+        self.head = 0
+        self.last = None
+
+    def peek(self, k: int = 0) -> Token:
+        i = self.head + k
+        window = self.window
+        if i < len(window):
+            return window[i]
+        while len(window) <= i:
+            token = next(self.tokens, None)
+            if token is None:
+                token = self.last
+            self.last = token
+            window.append(token)
+        return window[i]
+
+    def next(self) -> Token:
+        window = self.window
+        if self.head >= len(window):
+            self.peek()
+        token = window[self.head]
+        self.head += 1
+        if self.head == len(window):
+            window.clear()
+            self.head = 0
+        return token
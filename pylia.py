@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import os
+import sys
+
+from cache import CompileCache, write_atomic
+from compiler import Compiler
+
+STDIN = '-'
+
+
+def expand(patterns):
+    # Пути, шаблоны glob (** - любая глубина) и папки (все .py внутри) в порядке аргументов, без повторов
+    paths = []
+    missing = []
+    for pattern in patterns:
+        if pattern == STDIN:
+            matches = [STDIN]
+        elif os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, '**', '*.py'), recursive=True))
+        else:
+            matches = sorted(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+        if not matches:
+            missing.append(pattern)
+        for path in matches:
+            if path not in paths:
+                paths.append(path)
+    return paths, missing
+
+
+def output_path(source, output_dir):
+    target = os.path.splitext(source)[0] + '.jl'
+    if output_dir is None:
+        return target
+    # структура папок сохраняется относительно текущей папки, а для исходника вне ее - полный путь
+    # без корня: одноименные файлы из разных папок не затирают друг друга
+    relative = os.path.relpath(target)
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep) or os.path.isabs(relative):
+        drive, absolute = os.path.splitdrive(os.path.abspath(target))
+        relative = os.path.join(drive.rstrip(':'), absolute.lstrip(os.sep))
+    return os.path.join(output_dir, relative)
+
+
+def transpile(program, val_dispatch=False, cache=None):
+    result = cache.get(program, val_dispatch) if cache is not None else None
+    if result is None:
+        result = Compiler(program, val_dispatch).compile()
+        if cache is not None:
+            cache.put(program, result, val_dispatch)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='pylia',
+        description="Транслятор Python -> Julia. Без аргументов или с '-' читает программу из stdin "
+                    "и пишет результат в stdout."
+    )
+    parser.add_argument(
+        'inputs',
+        nargs='*',
+        help="Файлы, папки или шаблоны glob (в кавычках, например 'src/**/*.py'); '-' - stdin"
+    )
+    parser.add_argument(
+        '-o', '--output-dir',
+        type=str,
+        help='Папка для результатов; по умолчанию .jl кладется рядом с исходником'
+    )
+    parser.add_argument(
+        '--stdout',
+        action='store_true',
+        help='Писать результаты всех файлов в stdout, а не в файлы'
+    )
+    parser.add_argument(
+        '--val-dispatch',
+        action='store_true',
+        help='Прежний режим: все функции - методы call(::Val{:name}, ...)'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        help='Папка кэша результатов; без нее кэш не используется'
+    )
+    args = parser.parse_args(argv)
+
+    paths, missing = expand(args.inputs or [STDIN])
+    failed = 0
+    for pattern in missing:
+        print(f"pylia: {pattern}: нет подходящих файлов", file=sys.stderr)
+        failed += 1
+
+    cache = CompileCache(args.cache_dir) if args.cache_dir else None
+    # все файлы транслируются в одном процессе: импорт и таблицы лексера готовятся один раз
+    for path in paths:
+        try:
+            if path == STDIN:
+                program = sys.stdin.read()
+            else:
+                with open(path, 'r') as source_f:
+                    program = source_f.read()
+            result = transpile(program, args.val_dispatch, cache)
+        except Exception as error:
+            print(f"pylia: {'<stdin>' if path == STDIN else path}: {error}", file=sys.stderr)
+            failed += 1
+            continue
+
+        if path == STDIN or args.stdout:
+            try:
+                if args.stdout and len(paths) > 1:
+                    sys.stdout.write(f'# {path}\n')
+                sys.stdout.write(result)
+                if not result.endswith('\n'):
+                    sys.stdout.write('\n')
+                sys.stdout.flush()
+            except BrokenPipeError:
+                # читатель закрыл канал (например, | head): остальное никому не нужно. stdout
+                # перенаправляется в /dev/null, чтобы финальный сброс буфера при выходе не упал снова
+                os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+                break
+        else:
+            target = output_path(path, args.output_dir)
+            os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+            write_atomic(target, result)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
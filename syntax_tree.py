@@ -1,38 +1,63 @@
-from typing import List, Any, Optional, Dict, Set
+from typing import List, Any, Optional, Dict, Set, Iterable, Union
 
 from lex import *
 
 
+# Выражения свернуты: вместо цепочки одиночных оберток в дереве лежит сразу узел оператора,
+# PrimaryNode (атом с вызовами, полями и срезами) или сам атом
+Atom = Any  # IdentifierToken, AtomKeywordToken, NumberToken, StringToken, FStringNode, GroupNode, TupleNode, ListNode, NumpyNode, BuiltinFunctionNode
+Expression = Any  # DisjunctionNode, ConjunctionNode, InversionNode, ComparisonNode, SumNode, TermNode, FactorNode, PowerNode, PrimaryNode, Atom
+
+
+def children(node):
+    # значения всех полей узла в порядке объявления
+    for cls in type(node).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            yield getattr(node, name, None)
+
+
 class SyntaxNode:
+    __slots__ = ()
+
     def __init__(self):
         pass
 
 
 class StatementsNode(SyntaxNode):
+    __slots__ = ('statements',)
+
     def __init__(self):
         super().__init__()
         self.statements: List[StatementNode] = []
 
 
 class StatementNode(SyntaxNode):
+    __slots__ = ('statement',)
+
     def __init__(self):
         super().__init__()
         self.statement: Any[CompoundStatementNode, SimpleStatementNode] = None
 
 
 class SimpleStatementNode(SyntaxNode):
+    __slots__ = ('simple_statement',)
+
     def __init__(self):
         super().__init__()
         self.simple_statement: Any[AssignmentNode, ExpressionsNode, SimpleStmtKeywordToken] = None
 
 
 class CompoundStatementNode(SyntaxNode):
+    __slots__ = ('compound_statement',)
+
     def __init__(self):
         super().__init__()
         self.compound_statement: Any[FunctionDefNode, IfStatementNode, ForStatementNode, WhileStatementNode] = None
         
 
 class AssignmentNode(SyntaxNode):
+    __slots__ = ('declarations', 'expressions', 'op')
+
     def __init__(self):
         super().__init__()
         self.declarations: List[DeclarationNode] = []
@@ -41,20 +66,26 @@ class AssignmentNode(SyntaxNode):
 
 
 class DeclarationNode(SyntaxNode):
+    __slots__ = ('name', 'primary_', 'annotation')
+
     def __init__(self):
         super().__init__()
         self.name: IdentifierToken = None
         self.primary_: PrimaryNode_ = None
-        self.annotation: Optional[Any[ExpressionNode, TypeNode]] = None
+        self.annotation: Optional[Any[Expression, TypeNode]] = None
 
 
 class ReturnStatementNode(SyntaxNode):
+    __slots__ = ('expressions',)
+
     def __init__(self):
         super().__init__()
         self.expressions: Optional[ExpressionsNode] = None
 
 
 class BlockNode(SyntaxNode):
+    __slots__ = ('statements',)
+
     def __init__(self):
         super().__init__()
 
@@ -62,24 +93,32 @@ class BlockNode(SyntaxNode):
 
 
 class FunctionDefNode(SyntaxNode):
+    __slots__ = ('name', 'params', 'return_type', 'block')
+
     def __init__(self):
         super().__init__()
         self.name: IdentifierToken = None
         self.params: Optional[ParamsNode] = None
-        self.return_type: Optional[Any[ExpressionNode, TypeNode]] = None
+        self.return_type: Optional[Any[Expression, TypeNode]] = None
         self.block: BlockNode = None
         
 class ClassDefNode(SyntaxNode):
+    __slots__ = ('name', 'super_name', 'block', 'attrs', 'attr2type', 'has_init', 'has_dynamic_attrs')
+
     def __init__(self):
         super().__init__()
         self.name: IdentifierToken = None
         self.super_name: IdentifierToken = None
         self.block: BlockNode = None
-        self.attrs: Set[IdentifierToken] = set()
+        # словарь вместо множества: поля структуры идут в порядке объявления
+        self.attrs: Dict[IdentifierToken, None] = {}
         self.attr2type: Dict[IdentifierToken, ] = {}
         self.has_init: bool = False
+        self.has_dynamic_attrs: bool = True
         
 class SuperStatementNode(SyntaxNode):
+    __slots__ = ('super_name', 'super_call')
+
     def __init__(self):
         super().__init__()
         self.super_name: IdentifierToken = None
@@ -87,49 +126,63 @@ class SuperStatementNode(SyntaxNode):
 
 
 class ParamsNode(SyntaxNode):
+    __slots__ = ('params',)
+
     def __init__(self):
         super().__init__()
         self.params: List[ParamNode] = []
 
 
 class ParamNode(SyntaxNode):
+    __slots__ = ('name', 'annotation')
+
     def __init__(self):
         super().__init__()
         self.name: IdentifierToken = None
-        self.annotation: Optional[Any[ExpressionNode, TypeNode]] = None
+        self.annotation: Optional[Any[Expression, TypeNode]] = None
 
 
 class IfStatementNode(SyntaxNode):
+    __slots__ = ('condition', 'block', 'else_block')
+
     def __init__(self):
         super().__init__()
-        self.condition: ExpressionNode = None
+        self.condition: Expression = None
         self.block: BlockNode = None
         self.else_block: Optional[Any[ElifStatementNode, ElseBlockNode]] = None
 
 
 class ElifStatementNode(SyntaxNode):
+    __slots__ = ('condition', 'block', 'else_block')
+
     def __init__(self):
         super().__init__()
-        self.condition: ExpressionNode = None
+        self.condition: Expression = None
         self.block: BlockNode = None
         self.else_block: Optional[Any[ElifStatementNode, ElseBlockNode]] = None
 
 
 class ElseBlockNode(SyntaxNode):
+    __slots__ = ('block',)
+
     def __init__(self):
         super().__init__()
         self.block: BlockNode = None
 
 
 class WhileStatementNode(SyntaxNode):
+    __slots__ = ('condition', 'block', 'else_block')
+
     def __init__(self):
         super().__init__()
-        self.condition: ExpressionNode = None
+        self.condition: Expression = None
         self.block: BlockNode = None
         self.else_block: Optional['ElseBlockNode'] = None
 
 
 class ForStatementNode(SyntaxNode):
+    __slots__ = ('name', 'expressions', 'block', 'else_block')
+
     def __init__(self):
         super().__init__()
         self.name: IdentifierToken = None
@@ -139,104 +192,102 @@ class ForStatementNode(SyntaxNode):
 
 
 class ExpressionsNode(SyntaxNode):
+    __slots__ = ('expressions',)
+
     def __init__(self):
         super().__init__()
-        self.expressions: List[ExpressionNode] = []
+        self.expressions: List[Expression] = []
 
 
-class ExpressionNode(SyntaxNode):
+class BinaryChainNode(SyntaxNode):
+    __slots__ = ('operands', 'ops')
+
     def __init__(self):
         super().__init__()
-        self.disjunction: DisjunctionNode = None
+        self.operands: List[Expression] = []
+        self.ops: List[OperatorToken] = []
+
 
+class DisjunctionNode(BinaryChainNode):
+    __slots__ = ()
 
-class DisjunctionNode(SyntaxNode):
     def __init__(self):
         super().__init__()
-        self.conjuctions: List[ConjunctionNode] = []
+        self.ops: List[KeywordToken] = []
 
 
-class ConjunctionNode(SyntaxNode):
+class ConjunctionNode(BinaryChainNode):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
-        self.inverstions: List[InversionNode] = []
+        self.ops: List[KeywordToken] = []
 
 
 class InversionNode(SyntaxNode):
+    __slots__ = ('inv', 'comparison')
+
     def __init__(self):
         super().__init__()
         self.inv: Optional[KeywordToken] = None
-        self.comparison: ComparisonNode = None
+        self.comparison: Expression = None
 
 
-class ComparisonNode(SyntaxNode):
-    def __init__(self):
-        super().__init__()
-        self.sum: SumNode = None
-        self.comparison_: Optional[ComparisonNode_] = None
-
+class ComparisonNode(BinaryChainNode):
+    __slots__ = ()
 
-class ComparisonNode_(SyntaxNode):
     def __init__(self):
         super().__init__()
-        self.op: ComparisonOperatorToken = None
-        self.sum: SumNode = None
-        self.comparison_: Optional[ComparisonNode_] = None
-
+        self.ops: List[ComparisonOperatorToken] = []
 
-class SumNode(SyntaxNode):
-    def __init__(self):
-        super().__init__()
-        self.term: TermNode = None
-        self.sum_: Optional[SumNode_] = None
 
+class SumNode(BinaryChainNode):
+    __slots__ = ()
 
-class SumNode_(SyntaxNode):
     def __init__(self):
         super().__init__()
-        self.op: SumOperatorToken = None
-        self.term: TermNode = None
-        self.sum_: Optional[SumNode_] = None
+        self.ops: List[SumOperatorToken] = []
 
 
-class TermNode(SyntaxNode):
-    def __init__(self):
-        super().__init__()
-        self.factor: FactorNode = None
-        self.term_: Optional[TermNode_] = None
+class TermNode(BinaryChainNode):
+    __slots__ = ()
 
-
-class TermNode_(SyntaxNode):
     def __init__(self):
         super().__init__()
-        self.op: MulOperatorToken = None
-        self.factor: FactorNode = None
-        self.term_: Optional[TermNode_] = None
+        self.ops: List[MulOperatorToken] = []
 
 
 class FactorNode(SyntaxNode):
+    __slots__ = ('op', 'power')
+
     def __init__(self):
         super().__init__()
-        self.op: Optional[OperatorToken] = None
-        self.power: PowerNode = None
+        self.op: SumOperatorToken = None
+        self.power: Expression = None
 
 
 class PowerNode(SyntaxNode):
+    __slots__ = ('op', 'factor', 'primary')
+
     def __init__(self):
         super().__init__()
         self.op: Optional[OperatorToken] = None
-        self.factor: Optional[FactorNode] = None
-        self.primary: PrimaryNode = None
+        self.factor: Expression = None
+        self.primary: Expression = None
 
 
 class PrimaryNode(SyntaxNode):
+    __slots__ = ('atom', 'primary_')
+
     def __init__(self):
         super().__init__()
-        self.atom: AtomNode = None
-        self.primary_: Optional[PrimaryNode_] = None
+        self.atom: Atom = None
+        self.primary_: PrimaryNode_ = None
 
 
 class PrimaryNode_(SyntaxNode):
+    __slots__ = ('slices', 'arguments', 'subscript', 'primary_')
+
     def __init__(self):
         super().__init__()
         self.slices: Optional[SlicesNode] = None
@@ -246,38 +297,55 @@ class PrimaryNode_(SyntaxNode):
 
 
 class ArgumentsNode(SyntaxNode):
+    __slots__ = ('expressions', 'keywords')
+
     def __init__(self):
         super().__init__()
-        self.expressions: List[ExpressionNode] = []
+        self.expressions: List[Expression] = []
+        self.keywords: List[KeywordArgumentNode] = []
 
 
-class SlicesNode(SyntaxNode):
+class KeywordArgumentNode(SyntaxNode):
+    __slots__ = ('name', 'expression')
+
     def __init__(self):
         super().__init__()
-        self.slices: List[SliceNode] = []
+        self.name: IdentifierToken = None
+        # значение - выражение или имя типа (dtype=int)
+        self.expression: Union[Expression, TypeToken] = None
 
 
-class SliceNode(SyntaxNode):
+class SlicesNode(SyntaxNode):
+    __slots__ = ('slices',)
+
     def __init__(self):
         super().__init__()
-        self.from_expression: Optional[ExpressionNode] = None
-        self.to_expression: Optional[ExpressionNode] = None
-        self.step_expression: Optional[ExpressionNode] = None
+        self.slices: List[SliceNode] = []
 
 
-class AtomNode(SyntaxNode):
+class SliceNode(SyntaxNode):
+    __slots__ = ('from_expression', 'to_expression', 'step_expression', 'is_range')
+
     def __init__(self):
         super().__init__()
-        self.atom: Any[IdentifierToken, AtomKeywordToken, NumberToken, GroupNode, ListNode] = None
+        self.from_expression: Optional[Expression] = None
+        self.to_expression: Optional[Expression] = None
+        self.step_expression: Optional[Expression] = None
+        # a[i:j] в отличие от a[i]
+        self.is_range: bool = False
 
 
 class NumpyNode(SyntaxNode):
+    __slots__ = ('function',)
+
     def __init__(self):
         super().__init__()
         self.function: BuiltinFunctionNode = None
 
 
 class BuiltinFunctionNode(SyntaxNode):
+    __slots__ = ('name', 'arguments')
+
     def __init__(self):
         super().__init__()
         self.name: IdentifierToken = None
@@ -285,22 +353,38 @@ class BuiltinFunctionNode(SyntaxNode):
 
 
 class GroupNode(SyntaxNode):
+    __slots__ = ('expression',)
+
     def __init__(self):
         super().__init__()
-        self.expression: ExpressionNode = None
+        self.expression: Expression = None
+
+
+class TupleNode(SyntaxNode):
+    __slots__ = ('expressions',)
+
+    def __init__(self):
+        super().__init__()
+        self.expressions: List[Expression] = []
 
 
 class ListNode(SyntaxNode):
+    __slots__ = ('expressions',)
+
     def __init__(self):
         super().__init__()
         self.expressions: ExpressionsNode = None
         
 class TypeNode(SyntaxNode):
+    __slots__ = ('type',)
+
     def __init__(self):
         super().__init__()
         self.type: str = None
 
 class FStringNode(SyntaxNode):
+    __slots__ = ('content',)
+
     def __init__(self):
         super().__init__()
-        self.content: List[Any[ExpressionNode, StringToken]] = []
\ No newline at end of file
+        self.content: List[Any[StringToken, GroupNode]] = []
\ No newline at end of file
@@ -17,21 +17,51 @@ class NameSpace:
             return code
 
 
+# Приоритеты бинарных операторов и узлы-цепочки, которые они образуют
+DISJUNCTION, CONJUNCTION, INVERSION, COMPARISON, SUM, TERM = range(6)
+CHAIN_NODES = {
+    DISJUNCTION: DisjunctionNode,
+    CONJUNCTION: ConjunctionNode,
+    COMPARISON: ComparisonNode,
+    SUM: SumNode,
+    TERM: TermNode,
+}
+
+
 class Parser:
-    def __init__(self, seq: List[Token], compiler):
-        self.seq = seq
-        self.i = 0
+    def __init__(self, seq: Iterable[Token], compiler):
+        self.seq = TokenStream(seq)
         self.compiler = compiler
         self.cur_class = None
 
     def parse(self):
-        return self.statements()
+        self.imports()
+        if isinstance(self._sym(), EofToken):
+            # одни импорты: так разбирается и такая часть модуля в инкрементальной трансляции
+            return StatementsNode()
+        node = self.statements()
+        # операторы верхнего уровня должны дойти до конца программы, иначе остаток молча терялся бы
+        while isinstance(self._sym(), (NewlineToken, CommentToken)):
+            self._next()
+        if not isinstance(self._sym(), EofToken):
+            raise Exception('Statement parsing error: unexpected indentation')
+        return node
+
+    def imports(self):
+        # import numpy as np в начале модуля: функции np.* транслируются сами, импорт не нужен.
+        # Благодаря ему тестовые программы запускаются и в Python
+        while isinstance(self._sym(), KeywordToken) and self._sym().attr == 'import':
+            self._next()
+            self.expect(IdentifierToken, 'numpy', 'Import parsing error: only numpy can be imported')
+            self.expect(KeywordToken, 'as', "Import parsing error: 'as' expected")
+            self.expect(NumpyToken, None, "Import parsing error: numpy must be imported as np")
+            self.expect(NewlineToken, None, 'Import parsing error: new line expected')
 
     def _next(self):
-        self.i += 1
+        self.seq.next()
 
     def _sym(self):
-        return self.seq[self.i]
+        return self.seq.peek()
     
     def _search_constructor(self, statements: StatementsNode):
         for statement in statements.statements:
@@ -113,8 +143,15 @@ class Parser:
         if isinstance(self._sym(), IdentifierToken):
             is_assign = False
             j = 1
-            while (not isinstance(self.seq[self.i + j], (NewlineToken, EofToken))):
-                if isinstance(self.seq[self.i + j], DelimiterToken) and self.seq[self.i + j].attr in ('=', '+=', '-=', '*=', '/='):
+            # '=' внутри скобок - именованный аргумент вызова, а не присваивание
+            depth = 0
+            while (not isinstance(self.seq.peek(j), (NewlineToken, EofToken))):
+                token = self.seq.peek(j)
+                if isinstance(token, DelimiterToken) and token.attr in ('(', '['):
+                    depth += 1
+                elif isinstance(token, DelimiterToken) and token.attr in (')', ']'):
+                    depth -= 1
+                elif depth == 0 and isinstance(token, DelimiterToken) and token.attr in ('=', '+=', '-=', '*=', '/='):
                     is_assign = True
                     break
                 j += 1
@@ -204,9 +241,9 @@ class Parser:
                 
         if self.cur_class is not None:
             if node.name == 'self' and node.primary_ and node.primary_.subscript and not node.primary_.primary_:
-                self.cur_class.attrs.add(node.primary_.subscript.attr)
+                self.cur_class.attrs[node.primary_.subscript.attr] = None
                 if node.annotation and isinstance(node.annotation, TypeNode):
-                    self.cur_class.attr2type[node.name] = node.annotation.type
+                    self.cur_class.attr2type[node.primary_.subscript.attr] = node.annotation.type
             
         return node
 
@@ -333,7 +370,7 @@ class Parser:
             if node.super_name:
                 super_node = self.compiler.get_class(node.super_name.attr)
                 for attr in super_node.attrs:
-                    node.attrs.add(attr)
+                    node.attrs.setdefault(attr)
                     if attr not in node.attr2type and attr in super_node.attr2type:
                         node.attr2type[attr] = super_node.attr2type[attr]                
         else:
@@ -470,197 +507,106 @@ class Parser:
 
     def expression(self):
         # expression: disjunction
-        node = ExpressionNode()
-
+        #
+        # Разбор выражений - подъем по приоритетам (Pratt): операнды одного приоритета собираются
+        # в один узел-цепочку, узлы без операторов не создаются
         if type(self._sym()) in (SumOperatorToken, IdentifierToken,
                                  AtomKeywordToken, NumberToken,
                                  IntegerToken, FloatToken, FStringToken,
                                  FunctionToken, NumpyToken, StringToken) or \
                 isinstance(self._sym(), KeywordToken) and self._sym().attr == 'not' or \
                 isinstance(self._sym(), DelimiterToken) and self._sym().attr in ('(', '[', '{'):
-            node.disjunction = self.disjunction()
+            return self.binary(DISJUNCTION)
         else:
             raise Exception('Expression parsing error')
 
-        return node
-
-    def disjunction(self):
-        # disjunction:
-        #     | conjunction ('or' conjunction )+
-        #     | conjunction
-        node = DisjunctionNode()
-        node.conjuctions.append(self.conjunction())
+    def _binary_precedence(self):
+        sym = self._sym()
+        if isinstance(sym, KeywordToken) and sym.attr in ('or', 'and'):
+            return DISJUNCTION if sym.attr == 'or' else CONJUNCTION
+        if isinstance(sym, ComparisonOperatorToken):
+            return COMPARISON
+        if isinstance(sym, SumOperatorToken):
+            return SUM
+        if isinstance(sym, MulOperatorToken):
+            return TERM
+        return None
 
-        while isinstance(self._sym(), KeywordToken) and self._sym().attr == 'or':
-            self._next()
-            node.conjuctions.append(self.conjunction())
-        return node
+    def binary(self, min_precedence):
+        # disjunction: conjunction ('or' conjunction)*
+        # conjunction: inversion ('and' inversion)*
+        # comparison: sum (comparison_op sum)*
+        # comparison_op: '==' | '!=' | '<' | '>' | '<=' | '>='
+        # sum: term (('+' | '-') term)*
+        # term: factor (('*' | '/' | '//' | '%') factor)*
+        left = self.inversion(min_precedence)
+
+        precedence = self._binary_precedence()
+        while precedence is not None and precedence >= min_precedence:
+            node = CHAIN_NODES[precedence]()
+            node.operands.append(left)
+
+            while self._binary_precedence() == precedence:
+                node.ops.append(self._sym())
+                self._next()
+                node.operands.append(self.binary(precedence + 1))
 
-    def conjunction(self):
-        # conjunction:
-        #     | inversion ('and' inversion )+
-        #     | inversion
-        node = ConjunctionNode()
-        node.inverstions.append(self.inversion())
+            left = node
+            precedence = self._binary_precedence()
+        return left
 
-        while isinstance(self._sym(), KeywordToken) and self._sym().attr == 'and':
-            self._next()
-            node.inverstions.append(self.inversion())
-        return node
-
-    def inversion(self):
+    def inversion(self, min_precedence):
         # inversion:
         #     | 'not' inversion
         #     | comparison
-        node = InversionNode()
         if isinstance(self._sym(), KeywordToken) and self._sym().attr == 'not':
+            if min_precedence > INVERSION:
+                raise Exception('Inversion parsing error: "not" is not allowed here')
+            node = InversionNode()
+            node.inv = self._sym()
             self._next()
-            node.inv = self.inversion()
-        else:
-            node.comparison = self.comparison()
-        return node
-
-    def comparison(self):
-        # comparison:
-        #     | sum comparison_
-        #     | sum
-        node = ComparisonNode()
-        node.sum = self.sum()
-
-        if isinstance(self._sym(), ComparisonOperatorToken):
-            node.comparison_ = self.comparison_()
-        return node
-
-    def comparison_(self):
-        # comparison_:
-        #     | '==' sum comparison_
-        #     | '!=' sum comparison_
-        #     | '<' sum comparison_
-        #     | '>' sum comparison_
-        #     | '<=' sum comparison_
-        #     | '>=' sum comparison_
-        #     | 'in' sum comparison_
-        #     | 'not' 'in' sum comparison_
-        #     | '==' sum
-        #     | '!=' sum
-        #     | '<' sum
-        #     | '>' sum
-        #     | '<=' sum
-        #     | '>=' sum
-        #     | 'in' sum
-        #     | 'not' 'in' sum
-        node = ComparisonNode_()
-
-        if isinstance(self._sym(), ComparisonOperatorToken):
-            node.op = self._sym()
-            self._next()
-        else:
-            raise Exception('Comparison parsing error: Operator expected')
-
-        node.sum = self.sum()
-
-        if isinstance(self._sym(), ComparisonOperatorToken):
-            node.comparison_ = self.comparison_()
-        return node
-
-    def sum(self):
-        # sum:
-        #     | term sum_
-        #     | term
-        node = SumNode()
-        node.term = self.term()
-
-        if isinstance(self._sym(), SumOperatorToken):
-            node.sum_ = self.sum_()
-        return node
-
-    def sum_(self):
-        # sum_:
-        #     | '+' term sum_
-        #     | '-' term sum_
-        #     | '+' term
-        #     | '-' term
-        node = SumNode_()
-
-        if isinstance(self._sym(), SumOperatorToken):
-            node.op = self._sym()
-            self._next()
-        else:
-            raise Exception('Sum parsing error: Operator expected')
-        node.term = self.term()
-
-        if isinstance(self._sym(), SumOperatorToken):
-            node.sum_ = self.sum_()
-
-        return node
-
-    def term(self):
-        # term:
-        #     | factor term_
-        #     | factor
-        node = TermNode()
-        node.factor = self.factor()
-
-        if isinstance(self._sym(), MulOperatorToken):
-            node.term_ = self.term_()
-        return node
-
-    def term_(self):
-        # term_:
-        #     | '*' factor term_
-        #     | '/' factor term_
-        #     | '//' factor term_
-        #     | '%' factor term_
-        #     | '*' factor
-        #     | '/' factor
-        #     | '//' factor
-        #     | '%' factor
-        node = TermNode_()
-
-        if isinstance(self._sym(), MulOperatorToken):
-            node.op = self._sym()
-            self._next()
-        else:
-            raise Exception('Mul parsing error: Operator expected')
-        node.factor = self.factor()
-
-        if isinstance(self._sym(), MulOperatorToken):
-            node.term_ = self.term_()
-        return node
+            node.comparison = self.binary(INVERSION)
+            return node
+        return self.factor()
 
     def factor(self):
         # factor:
         #     | '+' factor
         #     | '-' factor
         #     | power
-        node = FactorNode()
         if isinstance(self._sym(), SumOperatorToken):
+            node = FactorNode()
             node.op = self._sym()
             self._next()
-        node.power = self.power()
-        return node
+            node.power = self.factor()
+            return node
+        return self.power()
 
     def power(self):
         # power:
         #     | primary '**' factor
         #     | primary
-        node = PowerNode()
-        node.primary = self.primary()
+        primary = self.primary()
         if isinstance(self._sym(), OperatorToken) and self._sym().attr == '**':
+            node = PowerNode()
+            node.primary = primary
             self._next()
             node.factor = self.factor()
-        return node
+            return node
+        return primary
 
     def primary(self):
         # primary:
         #     | atom primary_
         #     | atom
-        node = PrimaryNode()
-        node.atom = self.atom()
+        atom = self.atom()
 
         if isinstance(self._sym(), DelimiterToken) and self._sym().attr in ('.', '(', '['):
+            node = PrimaryNode()
+            node.atom = atom
             node.primary_ = self.primary_()
-        return node
+            return node
+        return atom
 
     def primary_(self):
         # primary_:
@@ -714,15 +660,36 @@ class Parser:
                                  FunctionToken, NumpyToken, StringToken) or \
                 isinstance(self._sym(), KeywordToken) and self._sym().attr == 'not' or \
                 isinstance(self._sym(), DelimiterToken) and self._sym().attr in ('(', '[', '{'):
-            node.expressions.append(self.expression())
+            self.argument(node)
 
             while isinstance(self._sym(), DelimiterToken) and self._sym().attr == ',':
                 self._next()
 
-                node.expressions.append(self.expression())
+                self.argument(node)
 
         return node
 
+    def argument(self, node: ArgumentsNode):
+        # argument:
+        #     | NAME '=' (expression | TYPE)
+        #     | expression
+        if isinstance(self._sym(), IdentifierToken) and isinstance(self.seq.peek(1), DelimiterToken) \
+                and self.seq.peek(1).attr == '=':
+            keyword = KeywordArgumentNode()
+            keyword.name = self._sym()
+            self._next()
+            self._next()
+            if isinstance(self._sym(), TypeToken):
+                keyword.expression = self._sym()
+                self._next()
+            else:
+                keyword.expression = self.expression()
+            node.keywords.append(keyword)
+        elif node.keywords:
+            raise Exception('Arguments parsing error: Positional argument follows keyword argument')
+        else:
+            node.expressions.append(self.expression())
+
     def slices(self):
         # slices:
         #     | slice
@@ -750,6 +717,7 @@ class Parser:
 
         if isinstance(self._sym(), DelimiterToken) and self._sym().attr == ':':
             self._next()
+            node.is_range = True
             if type(self._sym()) in (SumOperatorToken, AtomKeywordToken,
                                      IdentifierToken, NumberToken,
                                      IntegerToken, FloatToken,
@@ -777,23 +745,21 @@ class Parser:
         #     | NUMBER
         #     | group
         #     | list
-        node = AtomNode()
-
         if type(self._sym()) in (IdentifierToken, AtomKeywordToken,
                                  NumberToken, StringToken,
                                  IntegerToken, FloatToken):
-            node.atom = self._sym()
+            node = self._sym()
             self._next()
         elif isinstance(self._sym(), FStringToken):
-            node.atom = self.fstring()
+            node = self.fstring()
         elif isinstance(self._sym(), DelimiterToken) and self._sym().attr == '(':
-            node.atom = self.group()
+            node = self.group()
         elif isinstance(self._sym(), DelimiterToken) and self._sym().attr == '[':
-            node.atom = self.list()
+            node = self.list()
         elif isinstance(self._sym(), NumpyToken):
-            node.atom = self.numpy()
+            node = self.numpy()
         elif isinstance(self._sym(), FunctionToken):
-            node.atom = self.function()
+            node = self.function()
         else:
             raise Exception('Atom parsing error')
         return node
@@ -810,7 +776,8 @@ class Parser:
                     self._next()
                 elif isinstance(self._sym(), FStringExprToken):
                     self._next()
-                    expr = self.expression()
+                    expr = GroupNode()
+                    expr.expression = self.expression()
                     node.content.append(expr)
                     self.expect(FStringExprToken, None, 'Error')
                 else:
@@ -855,13 +822,24 @@ class Parser:
 
     def group(self):
         # group:
-        #     | '(' expressions ')'
+        #     | '(' expression ')'
+        #     | '(' expression ',' ','.(expression)* ')'
         node = GroupNode()
 
         self.expect(DelimiterToken, '(', 'Group parsing error: Symbol "(" expected')
 
         node.expression = self.expression()
 
+        if isinstance(self._sym(), DelimiterToken) and self._sym().attr == ',':
+            first = node.expression
+            node = TupleNode()
+            node.expressions.append(first)
+            while isinstance(self._sym(), DelimiterToken) and self._sym().attr == ',':
+                self._next()
+                if isinstance(self._sym(), DelimiterToken) and self._sym().attr == ')':
+                    break
+                node.expressions.append(self.expression())
+
         self.expect(DelimiterToken, ')', 'Group parsing error: Symbol ")" expected')
 
         return node
@@ -885,10 +863,15 @@ class Parser:
         return node
     
     def type(self):
+        # type: TYPE | 'list' '[' type ']'
         node = TypeNode()
         if isinstance(self._sym(), TypeToken):
             node.type = self._sym().attr
             self._next()
         else:
             raise Exception("Function parsing error: Type expected")
+        if node.type == 'list' and isinstance(self._sym(), DelimiterToken) and self._sym().attr == '[':
+            self._next()
+            node.type = f'list[{self.type().type}]'
+            self.expect(DelimiterToken, ']', 'Type parsing error: Symbol "]" expected')
         return node
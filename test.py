@@ -1,8 +1,51 @@
 import os
+import time
 import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from cache import CompileCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, write_atomic
 from compiler import Compiler
+from incremental import IncrementalCompiler
 
-def compile_and_save(test_filename):
+
+def compile_file(test_filename, cache=None, incremental=None):
+    # Компилирует один файл и возвращает (имя, путь результата, время в секундах, ошибка или None,
+    # взят ли результат из кэша). Исключения не выходят наружу, чтобы ошибка в одном файле
+    # не прерывала всю пачку. incremental - транслятор, который помнит прошлую версию файла
+    input_path = os.path.join('test', test_filename)
+    test_name = os.path.splitext(test_filename)[0]
+    output_path = os.path.join('out', f'{test_name}.jl')
+
+    start = time.perf_counter()
+    try:
+        with open(input_path, 'r') as test_f:
+            program = test_f.read()
+
+        result = cache.get(program) if cache is not None else None
+        cached = result is not None
+        if not cached:
+            # инкрементальный результат совпадает с полным (см. --check-incremental), его можно кэшировать
+            result = incremental.compile(program) if incremental is not None else Compiler(program).compile()
+            if cache is not None:
+                cache.put(program, result)
+
+        os.makedirs('out', exist_ok=True)
+        write_atomic(output_path, result)
+    except Exception:
+        return test_filename, output_path, time.perf_counter() - start, traceback.format_exc(limit=3), False
+    return test_filename, output_path, time.perf_counter() - start, None, cached
+
+
+def report(status):
+    test_filename, output_path, seconds, error, cached = status
+    if error is None:
+        source = ', из кэша' if cached else ''
+        print(f"{test_filename}: результат сохранен в {output_path} ({seconds * 1000:.1f} мс{source})")
+    else:
+        print(f"{test_filename}: ошибка компиляции ({seconds * 1000:.1f} мс)\n{error}")
+
+
+def compile_and_save(test_filename, cache=None):
     input_path = os.path.join('test', test_filename)
 
     if not os.path.isfile(input_path):
@@ -10,20 +53,99 @@ def compile_and_save(test_filename):
         return
 
     print(f"Компиляция файла: {test_filename}...")
-    with open(input_path, 'r') as test_f:
-        program = test_f.read()
+    status = compile_file(test_filename, cache)
+    report(status)
+    return status
 
-    compiler = Compiler(program)
-    result = compiler.compile()
 
-    test_name = os.path.splitext(test_filename)[0]
-    output_path = os.path.join('out', f'{test_name}.jl')
+def compile_all(test_files, jobs, cache=None):
+    # Файлы раздаются процессам по одному; результаты печатаются по мере готовности
+    if jobs <= 1:
+        return [compile_and_save(test_file, cache) for test_file in test_files]
+
+    statuses = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(compile_file, test_file, cache) for test_file in test_files]
+        for future in as_completed(futures):
+            status = future.result()
+            report(status)
+            statuses.append(status)
+    return statuses
+
+
+def full_compile(program):
+    try:
+        return Compiler(program).compile()
+    except Exception as error:
+        return f'ошибка: {error}'
+
+
+def check_incremental(test_files):
+    # Инкрементальная трансляция должна совпадать с полной: каждый файл правится построчно
+    # (вставка строки в первой колонке, с отступом, пустой строки, удаление строки), и после каждой
+    # правки один и тот же инкрементальный транслятор сравнивается с полной трансляцией
+    checked = failed = 0
+    for test_filename in test_files:
+        with open(os.path.join('test', test_filename), 'r') as test_f:
+            lines = test_f.read().split('\n')
+        variants = ['\n'.join(lines)]
+        for i in range(len(lines) + 1):
+            for extra in ('print(1)', '    print(2)', ''):
+                variants.append('\n'.join(lines[:i] + [extra] + lines[i:]))
+            if i < len(lines):
+                variants.append('\n'.join(lines[:i] + lines[i + 1:]))
 
-    os.makedirs('out', exist_ok=True)
+        incremental = IncrementalCompiler()
+        mismatches = []
+        for i, program in enumerate(variants):
+            try:
+                result = incremental.compile(program)
+            except Exception as error:
+                result = f'ошибка: {error}'
+            if result != full_compile(program):
+                mismatches.append(i)
+        checked += len(variants)
+        failed += len(mismatches)
+        if mismatches:
+            print(f"{test_filename}: {len(mismatches)} из {len(variants)} правок дают другой результат")
+            with open(os.path.join('out', f'{os.path.splitext(test_filename)[0]}.mismatch.py'), 'w') as bad_f:
+                bad_f.write(variants[mismatches[0]])
+    print(f"\nПроверено правок: {checked}, расхождений с полной трансляцией: {failed}")
+    return failed
 
-    with open(output_path, 'w') as result_f:
-        result_f.write(result)
-    print(f"Результат сохранен в: {output_path}\n")
+
+def source_times(names=None):
+    times = {}
+    for name in names if names is not None else os.listdir('test'):
+        try:
+            stat = os.stat(os.path.join('test', name))
+        except FileNotFoundError:
+            continue
+        if os.path.isfile(os.path.join('test', name)):
+            times[name] = stat.st_mtime_ns, stat.st_size
+    return times
+
+
+def watch(names, interval, cache=None):
+    # Процесс остается запущенным: модули транслятора импортированы один раз, а для каждого файла
+    # хранится инкрементальный транслятор, который заново разбирает только измененные определения.
+    # Изменения находятся опросом времени изменения и размера файлов
+    print("Наблюдение за папкой 'test' (Ctrl+C - выход)...")
+    compilers = {}
+    times = {}
+    try:
+        while True:
+            current = source_times(names)
+            for name in sorted(current):
+                if times.get(name) != current[name]:
+                    incremental = compilers.setdefault(name, IncrementalCompiler())
+                    report(compile_file(name, cache, incremental))
+            for name in times.keys() - current.keys():
+                compilers.pop(name, None)
+            times = current
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\nНаблюдение остановлено")
 
 
 if __name__ == '__main__':
@@ -35,15 +157,65 @@ if __name__ == '__main__':
         type=str,
         help='Имя конкретного файла из папки test для компиляции (например, my_test.txt)'
     )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+        help='Число процессов для параллельной компиляции (по умолчанию 1)'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Не использовать кэш результатов и транслировать все файлы заново'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        default=DEFAULT_CACHE_DIR,
+        help=f'Папка кэша результатов (по умолчанию {DEFAULT_CACHE_DIR})'
+    )
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        help='Предельный размер кэша в мегабайтах; старые записи вытесняются'
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Следить за папкой test и транслировать измененные файлы заново'
+    )
+    parser.add_argument(
+        '--check-incremental',
+        action='store_true',
+        help='Сравнить инкрементальную трансляцию с полной на построчных правках тестовых файлов'
+    )
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=0.2,
+        help='Период опроса файлов в режиме --watch, в секундах (по умолчанию 0.2)'
+    )
     args = parser.parse_args()
 
-    if args.test:
-        compile_and_save(args.test)
+    cache = None if args.no_cache else CompileCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+    if args.check_incremental:
+        os.makedirs('out', exist_ok=True)
+        test_files = [args.test] if args.test else sorted(name for name in os.listdir('test') if name.endswith('.py'))
+        raise SystemExit(1 if check_incremental(test_files) else 0)
+    elif args.watch:
+        watch([args.test] if args.test else None, args.interval, cache)
+    elif args.test:
+        compile_and_save(args.test, cache)
     else:
         print("Запуск компиляции для всех тестов в папке 'test'...")
-        test_files = os.listdir('test')
+        test_files = sorted(name for name in os.listdir('test') if os.path.isfile(os.path.join('test', name)))
         if not test_files:
             print("Папка 'test' пуста или не найдена.")
         else:
-            for test_file in test_files:
-                compile_and_save(test_file)
+            start = time.perf_counter()
+            statuses = compile_all(test_files, args.jobs, cache)
+            failed = sum(1 for status in statuses if status[3] is not None)
+            print(f"\nГотово: {len(statuses) - failed} из {len(statuses)} файлов "
+                  f"за {time.perf_counter() - start:.2f} с, ошибок: {failed}")
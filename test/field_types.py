@@ -0,0 +1,29 @@
+class Counter:
+    def __init__(self, items: list):
+        self.count = 0
+        self.level = 0
+        self.items = items
+        self.seen = [1, 2]
+
+    def bump(self, big: bool):
+        self.count = self.count + 1
+        if big:
+            self.level = 2.5
+
+
+def fill(n: int):
+    values = []
+    for i in range(n):
+        values.append(i)
+        values.append(0.5)
+    print(values)
+
+
+shared = [1, 2]
+c = Counter(shared)
+c.bump(False)
+shared.append(3)
+print(c.count, c.level, c.items, c.seen)
+c.bump(True)
+print(c.count, c.level)
+fill(2)
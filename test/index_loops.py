@@ -0,0 +1,54 @@
+import numpy as np
+
+
+def doubled(a: list):
+    for i in range(len(a)):
+        a[i] = a[i] * 2
+    print(a)
+
+
+def grow(a: list):
+    for i in range(len(a)):
+        if a[i] > 1:
+            a.append(a[i])
+    print(a)
+
+
+def weighted(a: list) -> int:
+    s = 0
+    for i in range(len(a)):
+        s += a[i] * i
+    return s
+
+
+def steps(a: list):
+    for i in range(len(a) - 1):
+        print(a[i + 1] - a[i])
+
+    for i in range(len(a)):
+        if i > 0:
+            print(a[i] - a[i - 1])
+
+
+def first_column(m):
+    for i in range(len(m)):
+        print(m[i, 0])
+
+
+def row_sums(m):
+    for i in range(len(m)):
+        print(np.sum(m[i]))
+
+
+def row_heads(rows: list):
+    for i in range(len(rows)):
+        print(rows[i][0])
+
+
+doubled([1, 2, 3])
+grow([1, 2, 3])
+print(weighted([1, 2, 3]))
+steps([1, 4, 9])
+first_column(np.ones((2, 3)))
+row_sums(np.ones((2, 3)))
+row_heads([[1, 2], [3, 4]])
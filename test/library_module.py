@@ -0,0 +1,18 @@
+class Greeter:
+    def __init__(self, name: str):
+        self.name = name
+
+    def greet(self) -> str:
+        return 'Hello, ' + self.name
+
+    def shout(self) -> str:
+        return self.greet() + '!'
+
+
+class LoudGreeter(Greeter):
+    def greet(self) -> str:
+        return 'HELLO, ' + self.name
+
+
+def helper(x: int) -> int:
+    return x * 2
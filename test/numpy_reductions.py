@@ -0,0 +1,76 @@
+import numpy as np
+
+
+def column_stats(m):
+    totals = np.sum(m, axis=0)
+    rows = np.sum(m, 1)
+    last = np.max(m, axis=-1)
+    first = np.min(m * 2, axis=-2)
+    both = np.sum(m, axis=(0, 1))
+    ends = np.mean(m, axis=(0, -1))
+    return totals, rows, last, first, both, ends
+
+
+def spread(m, axis: int):
+    center = np.median(m, axis=axis)
+    biased = np.std(m, axis=axis)
+    unbiased = np.std(m, axis=axis, ddof=1)
+    return center, biased, unbiased
+
+
+def shapes(n: int):
+    counts = np.zeros((n, 3), dtype=int)
+    weights = np.ones(n, dtype=float)
+    cube = np.ones((n, 2, 3))
+    flipped = np.transpose(cube, (2, 0, 1))
+    return counts, weights, flipped
+
+
+def report(values):
+    print(np.shape(values))
+    print(np.sum(values))
+
+
+grid = np.ones((2, 3))
+stats = column_stats(grid)
+# (3,) 6.0
+report(stats[0])
+# (2,) 6.0
+report(stats[1])
+# (2,) 2.0
+report(stats[2])
+# (3,) 6.0
+report(stats[3])
+# () 6.0
+report(stats[4])
+# () 1.0
+report(stats[5])
+
+spreads = spread(grid * 3, 0)
+# (3,) 9.0 (3,) 0.0 (3,) 0.0
+report(spreads[0])
+report(spreads[1])
+report(spreads[2])
+
+# (2,) 12.0
+report(np.sum(grid + 1, axis=-1))
+# (2, 1) 6.0
+report(np.sum(grid, axis=1, keepdims=True))
+# (1, 3) 3.0
+report(np.mean(grid, axis=-2, keepdims=True))
+# (1, 1) 6.0
+report(np.sum(grid * 1, keepdims=True))
+
+data = [1.0, 2.0, 3.0, 4.0]
+# 1.118033988749895
+print(np.std(data))
+# 1.118033988749895
+print(np.std(data, ddof=0))
+# 1.2909944487358056
+print(np.std(data, ddof=1))
+
+arrays = shapes(2)
+# (2, 3) 0 (2,) 2.0 (3, 2, 2) 12.0
+report(arrays[0])
+report(arrays[1])
+report(arrays[2])
@@ -0,0 +1,52 @@
+def squares(n: int):
+    result = []
+    for i in range(n):
+        result.append(i * i)
+    return result
+
+
+def total(n: int) -> int:
+    values = []
+    for i in range(n):
+        values.append(i + 1)
+    s = 0
+    for v in values:
+        s += v
+    return s
+
+
+def labels(n: int):
+    names = []
+    for i in range(n):
+        names.append('item' + str(i))
+    print(names)
+
+
+def evens(n: int):
+    picked = []
+    for i in range(n):
+        if i % 2 == 0:
+            picked.append(i)
+    return picked
+
+
+def copy_all(a: list) -> list:
+    out = []
+    for i in range(len(a)):
+        out.append(a[i])
+    return out
+
+
+sq = squares(5)
+sq.append('done')
+print(sq)
+print(total(4))
+labels(3)
+print(evens(6))
+print(copy_all([3, 1, 2]))
+
+cubes = []
+for k in range(4):
+    cubes.append(k * k * k)
+
+print(cubes)
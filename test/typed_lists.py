@@ -0,0 +1,49 @@
+def countdown(n: int):
+    found = []
+    while n > 0:
+        found.append(n * 10)
+        n = n - 1
+    print(found)
+
+
+def halves(n: int):
+    out = []
+    for i in range(n):
+        if i > 1:
+            out.append(i / 2)
+    print(out)
+
+
+def names(n: int):
+    parts = []
+    for i in range(n):
+        if i != 1:
+            parts.append('n' + str(i))
+    print(parts)
+
+
+def mixed(n: int):
+    items = []
+    for i in range(n):
+        if i % 2 == 0:
+            items.append(i)
+        else:
+            items.append(str(i))
+    print(items)
+
+
+def numbers(n: int):
+    nums = []
+    for i in range(n):
+        if i > 1:
+            nums.append(i)
+        else:
+            nums.append(0.5)
+    print(nums)
+
+
+countdown(3)
+halves(4)
+names(3)
+mixed(4)
+numbers(3)
@@ -0,0 +1,43 @@
+def grow(b: list):
+    b.append(0)
+
+
+def tail_sum(a: list) -> int:
+    s = 0
+    for x in a[1:]:
+        s += x
+    return s
+
+
+def middle(a: list):
+    part = a[1:3]
+    print(len(part))
+    print(part)
+    print(a[:2])
+
+
+def edited(a: list):
+    part = a[0:2]
+    part.append(9)
+    print(part)
+    print(a)
+
+
+def handed_over(a: list):
+    part = a[:2]
+    grow(part)
+    print(part)
+    print(a)
+
+
+def extend_from(a: list):
+    for x in a[:2]:
+        a.append(x)
+    print(a)
+
+
+print(tail_sum([1, 2, 3, 4]))
+middle([1, 2, 3, 4])
+edited([1, 2, 3])
+handed_over([1, 2, 3])
+extend_from([5, 6])